@@ -4,22 +4,352 @@ Enhanced Metadata Extractor for Anchorite RL System
 Fetches real webpage content to enable content-aware filtering
 """
 
+import asyncio
+import atexit
 import requests
+from requests.adapters import HTTPAdapter
 import re
 import json
+import hashlib
+import ipaddress
+import os
+import socket
+import sqlite3
+import sys
 import time
 import logging
 try:
-    from bs4 import BeautifulSoup
+    from selectolax.lexbor import LexborHTMLParser
 except ImportError:
-    print("Warning: BeautifulSoup not found. Install with: pip install beautifulsoup4")
+    LexborHTMLParser = None
+try:
+    from bs4 import BeautifulSoup, NavigableString, CData
+except ImportError:
+    if LexborHTMLParser is None:
+        print("Warning: No HTML parser found. Install with: pip install selectolax (or beautifulsoup4)")
     BeautifulSoup = None
+try:
+    import httpx
+except ImportError:
+    httpx = None
+try:
+    import brotli  # noqa: F401 - lets urllib3/httpx decode 'br' responses
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+try:
+    import lxml  # noqa: F401 - only needed as a BeautifulSoup backend
+    HTML_PARSER = 'lxml'
+except ImportError:
+    # Pure-Python parser is much slower but always available
+    HTML_PARSER = 'html.parser'
 from urllib.parse import urlparse, parse_qs
 from typing import Dict, List, Optional, Any
 import threading
+from collections import OrderedDict
+from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 
+# Parser-agnostic node helpers: pages are parsed with selectolax (Lexbor) when it is
+# installed and with BeautifulSoup otherwise; the extractors only use these helpers.
+
+def _select_one(doc, selector: str):
+    """Return the first node matching a CSS selector, or None"""
+    if LexborHTMLParser is not None:
+        return doc.css_first(selector)
+    return doc.select_one(selector)
+
+
+def _node_text(node) -> str:
+    """Return the text content of a node (or of a whole document)"""
+    if LexborHTMLParser is not None:
+        return node.text()
+    return node.get_text()
+
+
+def _node_text_length(node) -> int:
+    """Return len(_node_text(node)) without joining BeautifulSoup strings"""
+    if LexborHTMLParser is not None:
+        # Lexbor builds the text natively; walking text nodes in Python is slower
+        return len(node.text())
+    return sum(len(s) for s in node.strings)
+
+
+def _node_attr(node, name: str) -> str:
+    """Return an attribute value, '' when missing or valueless"""
+    if LexborHTMLParser is not None:
+        return node.attributes.get(name) or ''
+    return node.get(name) or ''
+
+
+def _node_tag(node) -> str:
+    """Return the lowercase tag name of a node"""
+    if LexborHTMLParser is not None:
+        return node.tag
+    return node.name
+
+
+def _node_attrs(node) -> dict:
+    """Return all attributes of a node as a dict"""
+    if LexborHTMLParser is not None:
+        return node.attributes
+    return node.attrs
+
+
+def _iter_elements(doc):
+    """Yield every element of a document in document order"""
+    if LexborHTMLParser is not None:
+        return doc.root.traverse() if doc.root is not None else iter(())
+    return _iter_soup_elements(doc)
+
+
+def _iter_soup_elements(doc):
+    """BeautifulSoup elements in document order; <template> contents are skipped, as Lexbor keeps them out of the tree"""
+    stack = [iter(doc.contents)]
+    while stack:
+        for child in stack[-1]:
+            if child.name is not None:
+                yield child
+                if child.name != 'template':
+                    stack.append(iter(child.contents))
+                    break
+        else:
+            stack.pop()
+
+
+# Elements whose text is code or fallback markup rather than page content
+_NON_CONTENT_TAGS = frozenset(('script', 'style', 'noscript', 'template'))
+
+
+def _iter_text(doc):
+    """Yield the text nodes of a document in order, skipping _NON_CONTENT_TAGS subtrees"""
+    if LexborHTMLParser is not None:
+        return _iter_lexbor_text(doc.root)
+    return _iter_soup_text(doc)
+
+
+def _iter_lexbor_text(root):
+    """Depth-first walk over sibling/child links, so skipped subtrees are never entered"""
+    if root is None:
+        return
+    node = root.child
+    depth = 1
+    while node is not None:
+        tag = node.tag
+        if tag == '-text':
+            yield node.text_content
+        elif tag not in _NON_CONTENT_TAGS:
+            child = node.child
+            if child is not None:
+                node = child
+                depth += 1
+                continue
+        while node.next is None:
+            depth -= 1
+            if depth == 0:
+                return
+            node = node.parent
+        node = node.next
+
+
+def _iter_soup_text(doc):
+    """BeautifulSoup counterpart of _iter_lexbor_text (plain strings only, like get_text())"""
+    stack = [iter(doc.contents)]
+    while stack:
+        for child in stack[-1]:
+            if child.name is None:
+                if type(child) is NavigableString or type(child) is CData:
+                    yield child
+            elif child.name not in _NON_CONTENT_TAGS:
+                stack.append(iter(child.contents))
+                break
+        else:
+            stack.pop()
+
+
+def _user_cache_dir() -> str:
+    """Per-user cache directory for Anchorite (LOCALAPPDATA on Windows, ~/Library/Caches on macOS, XDG elsewhere)"""
+    if sys.platform == "win32":
+        return os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "Anchorite", "Cache")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Caches", "Anchorite")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "anchorite")
+
+
+# Keywords used to score YouTube titles/descriptions
+_EDUCATIONAL_KEYWORDS = (
+    'tutorial', 'learn', 'course', 'education', 'explain', 'guide', 'how to',
+    'lesson', 'teaching', 'instruction', 'training', 'study', 'academic',
+    'university', 'college', 'research', 'analysis', 'theory', 'concept',
+    'algorithm', 'programming', 'coding', 'development', 'science',
+    'mathematics', 'physics', 'chemistry', 'biology', 'history',
+    'machine learning', 'data science', 'artificial intelligence',
+    'logistic regression', 'neural network', 'deep learning'
+)
+
+_ENTERTAINMENT_KEYWORDS = (
+    'funny', 'comedy', 'meme', 'cute', 'adorable', 'hilarious', 'lol',
+    'entertainment', 'fun', 'game', 'play', 'music video', 'vlog',
+    'reaction', 'prank', 'challenge', 'trend', 'viral', 'cat', 'dog',
+    'pet', 'animal compilation', 'fail', 'epic', 'awesome', 'cool',
+    'amazing', 'incredible', 'unbelievable', 'shocking'
+)
+
+
+def _build_keyword_automaton():
+    """Compile both keyword lists into one Aho-Corasick automaton (None without pyahocorasick)"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in _EDUCATIONAL_KEYWORDS:
+        automaton.add_word(keyword, ('edu', keyword))
+    for keyword in _ENTERTAINMENT_KEYWORDS:
+        automaton.add_word(keyword, ('ent', keyword))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+def _count_keyword_indicators(text: str):
+    """Return (educational, entertainment) counts of distinct keywords found in text"""
+    if _KEYWORD_AUTOMATON is None:
+        educational = sum(1 for keyword in _EDUCATIONAL_KEYWORDS if keyword in text)
+        entertainment = sum(1 for keyword in _ENTERTAINMENT_KEYWORDS if keyword in text)
+        return educational, entertainment
+    
+    # One pass over the text; a keyword counts once however often it occurs
+    matched = {value for _, value in _KEYWORD_AUTOMATON.iter(text)}
+    educational = sum(1 for category, _ in matched if category == 'edu')
+    return educational, len(matched) - educational
+
+
+# Patterns used by _clean_text
+_WHITESPACE_RE = re.compile(r'\s+')
+_NON_PRINTABLE_RE = re.compile(r'[^\x20-\x7E]')
+
+# Errors raised by either HTTP client for network/protocol failures
+_NETWORK_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx is not None else ())
+
+# YouTube selectors, tried in order until one yields text
+_YT_TITLE_SELECTORS = (
+    'h1[class*="title"]',
+    'h1.ytd-video-primary-info-renderer',
+    'h1.ytd-watch-metadata',
+    'meta[property="og:title"]',
+    'title',
+)
+_YT_DESCRIPTION_SELECTORS = (
+    'meta[name="description"]',
+    'meta[property="og:description"]',
+    '[class*="description"]',
+    '#description',
+)
+_YT_CHANNEL_SELECTORS = (
+    'link[itemprop="name"]',
+    '[class*="channel"]',
+    'meta[property="og:site_name"]',
+)
+
+# URL extensions that are never HTML pages; these skip the network fetch entirely
+_SKIP_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.bmp',
+    '.css', '.js', '.mjs', '.map', '.json', '.woff', '.woff2', '.ttf', '.otf',
+    '.mp3', '.mp4', '.webm', '.m4a', '.m4s', '.ts', '.pdf', '.zip', '.gz'
+})
+
+# Raw characters of page text kept for extracted_text (enough to yield 1000 after cleaning)
+_TEXT_SAMPLE_LIMIT = 4096
+
+# Tags counted during the single DOM walk in _extract_page_metadata
+_COUNTED_TAGS = (
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol',
+    'img', 'form', 'code', 'pre', 'video', 'iframe'
+)
+
+
+def _is_internal_address(address) -> bool:
+    return address.is_private or address.is_loopback or address.is_link_local
+
+
+def _is_internal_literal(host: str) -> bool:
+    """True if host is localhost or a loopback, private or link-local IP literal (no DNS lookup)"""
+    if host == 'localhost' or host.endswith('.localhost'):
+        return True
+    try:
+        return _is_internal_address(ipaddress.ip_address(host))
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=4096)
+def _resolves_to_internal(host: str) -> bool:
+    """True if host resolves to a loopback, private or link-local address (blocking DNS lookup)"""
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except (socket.gaierror, UnicodeError):
+        # Unresolvable: let the fetch fail (and be negatively cached) as before
+        return False
+    # Strip any IPv6 zone id ("fe80::1%eth0") before parsing
+    return any(_is_internal_address(ipaddress.ip_address(info[4][0].split('%')[0])) for info in infos)
+
+
+class FrequencySketch:
+    """Count-min sketch with a doorkeeper, used as a TinyLFU cache admission filter.
+    
+    Keys are the 128-bit hex digests from _get_cache_key, so the four row
+    indexes are sliced straight out of the digest instead of re-hashing.
+    """
+    
+    def __init__(self, width: int = 4096, sample_size: int = 100000):
+        self.width = width
+        self.depth = 4  # one row per 32-bit slice of the digest
+        self.sample_size = sample_size
+        self._table = bytearray(self.width * self.depth)  # 1-byte saturating counters
+        self._doorkeeper = set()  # keys seen once since the last reset
+        self._additions = 0
+    
+    def _indexes(self, key: str):
+        h = int(key, 16)
+        for row in range(self.depth):
+            yield row * self.width + ((h >> (row * 32)) & 0xFFFFFFFF) % self.width
+    
+    def increment(self, key: str):
+        """Record one access to key"""
+        if key not in self._doorkeeper:
+            # First sighting only goes to the doorkeeper so one-hit URLs never reach the sketch
+            self._doorkeeper.add(key)
+        else:
+            for i in self._indexes(key):
+                if self._table[i] < 255:
+                    self._table[i] += 1
+        
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._reset()
+    
+    def frequency(self, key: str) -> int:
+        """Estimate how often key was accessed in the current sample"""
+        count = min(self._table[i] for i in self._indexes(key))
+        return count + (1 if key in self._doorkeeper else 0)
+    
+    def _reset(self):
+        """Halve all counters and clear the doorkeeper so stale popularity ages out"""
+        self._table = bytearray(c >> 1 for c in self._table)
+        self._doorkeeper.clear()
+        self._additions = 0
+
+
 class EnhancedMetadataExtractor:
     """Enhanced metadata extractor that fetches actual webpage content"""
     
@@ -32,60 +362,229 @@ class EnhancedMetadataExtractor:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
+            # Only advertise Brotli when we can decode it
+            'Accept-Encoding': 'gzip, br, deflate' if BROTLI_AVAILABLE else 'gzip, deflate',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
         
+        # Larger keep-alive pool than the default 10 so concurrent fetches to many hosts don't queue
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Site-specific extractors, keyed by registered domain (subdomains match too)
+        self.site_extractors = {
+            'youtube.com': self._extract_youtube_metadata,
+            'youtu.be': self._extract_youtube_metadata,
+        }
+        
         # Timeouts and limits
         self.request_timeout = 8  # seconds
         self.max_content_length = 500000  # 500KB max
         self.max_workers = 3
         
-        # Cache for performance
-        self.metadata_cache = {}
+        # Cache for performance (bounded LRU, also written from executor threads)
+        self.metadata_cache = OrderedDict()  # cache_key -> (metadata, timestamp, is_negative)
         self.cache_ttl = 300  # 5 minutes
+        self.negative_cache_ttl = 60  # failed/timed-out fetches are retried after 1 minute
+        self.cache_max_size = 10000
+        self._cache_lock = threading.Lock()
+        # TinyLFU admission keeps one-shot URLs from evicting popular entries
+        self._cache_frequency = FrequencySketch(sample_size=10 * self.cache_max_size)
         
-        # Threading for non-blocking operation
+        # Persistent second-tier cache (survives restarts, shared by proxy workers)
+        self.disk_cache_path = os.path.join(_user_cache_dir(), "metadata_cache.db")
+        self.disk_cache_ttl = 3600  # 1 hour
+        self.disk_cache_max_rows = 100000
+        self._disk_writes = 0
+        self._setup_disk_cache()
+        
+        # Fetches currently running, so concurrent misses for one URL share a single fetch
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Threading for non-blocking operation (HTML parsing, disk cache, requests fallback)
         self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
         
+        # Async HTTP client on a dedicated event loop thread: many fetches in flight
+        # without a thread each. Without httpx, fetches use the requests session above.
+        self._loop = None
+        self.aclient = None
+        if httpx is not None:
+            self._setup_async_client()
+        
     def extract_metadata_async(self, url: str) -> Dict[str, Any]:
         """Extract metadata asynchronously (non-blocking for proxy)"""
         try:
+            # Static assets (images, scripts, fonts...) carry no page metadata
+            extension = os.path.splitext(urlparse(url).path)[1].lower()
+            if extension in _SKIP_EXTENSIONS:
+                return self._create_basic_metadata(url)
+            
+            # LAN dashboards, routers and localhost aren't worth a fetch (or its timeout).
+            # Only literals are checked here; names are resolved inside the fetch task,
+            # within the time budget below, so a slow resolver can't stall the caller.
+            host = urlparse(url).hostname
+            if host and _is_internal_literal(host):
+                return self._create_basic_metadata(url)
+            
             # Check cache first
             cache_key = self._get_cache_key(url)
-            if cache_key in self.metadata_cache:
-                cached_data, timestamp = self.metadata_cache[cache_key]
-                if time.time() - timestamp < self.cache_ttl:
-                    return cached_data
+            cached_data = self._get_cached_metadata(cache_key)
+            if cached_data is not None:
+                return cached_data
+            
+            # Then the persistent cache
+            cached_data = self._get_disk_metadata(cache_key)
+            if cached_data is not None:
+                self._cache_metadata(cache_key, cached_data)
+                return cached_data
             
-            # Submit async task
-            future = self.executor.submit(self._extract_metadata_sync, url)
+            # Submit async task (it fills both caches, even if we stop waiting for it)
+            future = self._submit_extraction(url, cache_key)
             
             # Try to get result quickly, fallback to basic metadata if slow
             try:
-                metadata = future.result(timeout=2.0)  # 2 second timeout for real-time filtering
-                
-                # Cache the result
-                self.metadata_cache[cache_key] = (metadata, time.time())
-                return metadata
+                return future.result(timeout=2.0)  # 2 second timeout for real-time filtering
                 
             except FutureTimeoutError:
                 self.logger.warning(f"Metadata extraction timeout for {url}, using basic metadata")
-                return self._create_basic_metadata(url)
+                metadata = self._create_basic_metadata(url)
+                # Replaced by the real result if the fetch still completes
+                self._cache_metadata(cache_key, metadata, is_negative=True)
+                return metadata
                 
         except Exception as e:
             self.logger.error(f"Error in async metadata extraction for {url}: {e}")
             return self._create_basic_metadata(url)
     
+    def _setup_async_client(self):
+        """Start the event loop thread and the shared httpx client"""
+        headers = {k: v for k, v in self.session.headers.items() if k.lower() != 'connection'}
+        limits = httpx.Limits(max_keepalive_connections=50, max_connections=100)
+        try:
+            self.aclient = httpx.AsyncClient(http2=True, headers=headers, limits=limits,
+                                             timeout=self.request_timeout, follow_redirects=True)
+        except ImportError:
+            # HTTP/2 needs the h2 package; HTTP/1.1 keep-alive still multiplexes fine
+            self.aclient = httpx.AsyncClient(headers=headers, limits=limits,
+                                             timeout=self.request_timeout, follow_redirects=True)
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="metadata-http", daemon=True).start()
+    
+    def _submit_extraction(self, url: str, cache_key: str):
+        """Schedule a fetch, or join the one already in flight for this URL.
+        
+        Returns a concurrent.futures.Future either way.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            if future is not None:
+                return future
+            if self._loop is not None:
+                future = asyncio.run_coroutine_threadsafe(self._extract_and_cache_httpx(url, cache_key), self._loop)
+            else:
+                future = self.executor.submit(self._extract_and_cache, url, cache_key)
+            self._inflight[cache_key] = future
+        
+        # Outside the lock: the callback runs immediately if the future is already done
+        future.add_done_callback(lambda f: self._finish_extraction(cache_key, f))
+        return future
+    
+    def _finish_extraction(self, cache_key: str, future):
+        with self._inflight_lock:
+            if self._inflight.get(cache_key) is future:
+                del self._inflight[cache_key]
+    
+    def _extract_and_cache(self, url: str, cache_key: str) -> Dict[str, Any]:
+        """Extract metadata and store it in both cache tiers (runs on the executor).
+        
+        Failed fetches fall back to basic metadata, which is cached in memory
+        only and for negative_cache_ttl, so a dead host costs one fetch per window.
+        """
+        try:
+            metadata = self._extract_metadata_sync(url)
+        except Exception as e:
+            return self._cache_failure(url, cache_key, e)
+        return self._cache_success(cache_key, metadata)
+    
+    async def _extract_and_cache_httpx(self, url: str, cache_key: str) -> Dict[str, Any]:
+        """Event-loop counterpart of _extract_and_cache"""
+        try:
+            metadata = await self._extract_metadata_httpx(url)
+        except Exception as e:
+            return self._cache_failure(url, cache_key, e)
+        # The sqlite write blocks, so keep it off the event loop
+        return await self._loop.run_in_executor(self.executor, self._cache_success, cache_key, metadata)
+    
+    def _cache_success(self, cache_key: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        self._cache_metadata(cache_key, metadata)
+        self._store_disk_metadata(cache_key, metadata)
+        return metadata
+    
+    def _cache_failure(self, url: str, cache_key: str, error: Exception) -> Dict[str, Any]:
+        if isinstance(error, _NETWORK_ERRORS):
+            self.logger.warning(f"Network error fetching {url}: {error}")
+        else:
+            self.logger.error(f"Error extracting metadata from {url}: {error}")
+        metadata = self._create_basic_metadata(url)
+        self._cache_metadata(cache_key, metadata, is_negative=True)
+        return metadata
+    
     def _extract_metadata_sync(self, url: str) -> Dict[str, Any]:
-        """Synchronously extract detailed metadata from URL"""
+        """Synchronously extract detailed metadata from URL (raises on fetch/parse errors)"""
+        # Basic metadata structure
+        metadata = self._create_basic_metadata(url)
+        
+        # Hosts on the LAN are not fetched
+        host = urlparse(url).hostname
+        if host and _resolves_to_internal(host):
+            return metadata
+        
+        # Fetch webpage content
+        response = self.session.get(url, timeout=self.request_timeout, stream=True)
+        
+        # Only HTML/XML documents are worth downloading and parsing
+        content_type = response.headers.get('content-type', '').lower()
+        if content_type and 'html' not in content_type and 'xml' not in content_type:
+            response.close()
+            return metadata
+        
+        # Check content length
+        content_length = response.headers.get('content-length')
+        if content_length and int(content_length) > self.max_content_length:
+            self.logger.warning(f"Content too large for {url}, using basic metadata")
+            response.close()
+            return metadata
+        
+        # Read content with size limit in one bounded read (urllib3 decompresses gzip/br)
         try:
-            # Basic metadata structure
-            metadata = self._create_basic_metadata(url)
-            
-            # Fetch webpage content
-            response = self.session.get(url, timeout=self.request_timeout, stream=True)
+            content = response.raw.read(self.max_content_length + 1, decode_content=True)
+        finally:
+            # Stop reading an oversized body and release the socket
+            response.close()
+        
+        if len(content) > self.max_content_length:
+            content = content[:self.max_content_length]
+        
+        return self._parse_page(url, content, metadata)
+    
+    async def _extract_metadata_httpx(self, url: str) -> Dict[str, Any]:
+        """Fetch a page with the async client and parse it on the executor"""
+        metadata = self._create_basic_metadata(url)
+        
+        # Hosts on the LAN are not fetched; the lookup blocks, so it runs off the loop (and
+        # off self.executor, so a slow resolver doesn't hold up parsing)
+        host = urlparse(url).hostname
+        if host and await self._loop.run_in_executor(None, _resolves_to_internal, host):
+            return metadata
+        
+        async with self.aclient.stream('GET', url) as response:
+            # Only HTML/XML documents are worth downloading and parsing
+            content_type = response.headers.get('content-type', '').lower()
+            if content_type and 'html' not in content_type and 'xml' not in content_type:
+                return metadata
             
             # Check content length
             content_length = response.headers.get('content-length')
@@ -94,32 +593,48 @@ class EnhancedMetadataExtractor:
                 return metadata
             
             # Read content with size limit
-            content = b''
-            for chunk in response.iter_content(chunk_size=8192):
-                content += chunk
-                if len(content) > self.max_content_length:
+            chunks = []
+            total = 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                total += len(chunk)
+                if total > self.max_content_length:
                     break
-            
-            # Parse HTML
-            if BeautifulSoup is None:
-                self.logger.warning("BeautifulSoup not available, using basic metadata")
-                return metadata
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Enhanced metadata extraction
-            metadata.update(self._extract_html_metadata(soup, url))
-            metadata.update(self._extract_youtube_metadata(soup, url))
-            metadata.update(self._extract_open_graph_metadata(soup))
-            metadata.update(self._extract_content_analysis(soup))
-            
+        
+        content = b''.join(chunks)[:self.max_content_length]
+        
+        # Parsing is CPU-bound; don't stall other fetches on the loop
+        return await self._loop.run_in_executor(self.executor, self._parse_page, url, content, metadata)
+    
+    def _parse_page(self, url: str, content: bytes, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Parse fetched HTML and add the extracted fields to metadata"""
+        # Parse HTML once; the extractors all share the same document
+        if LexborHTMLParser is not None:
+            doc = LexborHTMLParser(content)
+        elif BeautifulSoup is not None:
+            doc = BeautifulSoup(content, HTML_PARSER)
+        else:
+            self.logger.warning("No HTML parser available, using basic metadata")
             return metadata
-            
-        except requests.RequestException as e:
-            self.logger.warning(f"Network error fetching {url}: {e}")
-            return self._create_basic_metadata(url)
-        except Exception as e:
-            self.logger.error(f"Error extracting metadata from {url}: {e}")
-            return self._create_basic_metadata(url)
+        
+        # Enhanced metadata extraction
+        metadata.update(self._extract_page_metadata(doc, url))
+        
+        # Site-specific extraction only runs for sites that have an extractor
+        site_extractor = self._get_site_extractor(metadata['domain'])
+        if site_extractor is not None:
+            metadata.update(site_extractor(doc, url))
+        
+        return metadata
+    
+    def _get_site_extractor(self, domain: str):
+        """Find the site-specific extractor for a domain or any of its parent domains"""
+        while domain:
+            extractor = self.site_extractors.get(domain)
+            if extractor is not None:
+                return extractor
+            domain = domain.partition('.')[2]
+        return None
     
     def _create_basic_metadata(self, url: str) -> Dict[str, Any]:
         """Create basic metadata when full extraction fails"""
@@ -148,51 +663,104 @@ class EnhancedMetadataExtractor:
             "youtube_description": "",
             "youtube_channel": "",
             "youtube_category": "",
+            "youtube_keywords": [],
             "content_quality_score": 0.0,
             "educational_indicators": 0,
             "entertainment_indicators": 0
         }
     
-    def _extract_html_metadata(self, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
-        """Extract standard HTML metadata"""
-        metadata = {}
+    def _extract_page_metadata(self, doc, url: str) -> Dict[str, Any]:
+        """Extract HTML, Open Graph and content-structure metadata in a single DOM walk"""
+        counts = dict.fromkeys(_COUNTED_TAGS, 0)
+        title = None
+        meta_description = None
+        meta_keywords = None
+        og_data = {}
+        hrefs = []
+        paragraph_text_length = 0
         
-        # Title
-        title_tag = soup.find('title')
-        metadata['title'] = title_tag.get_text().strip() if title_tag else ""
+        for node in _iter_elements(doc):
+            tag = _node_tag(node)
+            if tag in counts:
+                counts[tag] += 1
+            
+            if tag == 'p':
+                paragraph_text_length += _node_text_length(node)
+            elif tag == 'a':
+                href = _node_attrs(node).get('href')
+                if href is not None:
+                    hrefs.append(href)
+            elif tag == 'meta':
+                attrs = _node_attrs(node)
+                name = attrs.get('name')
+                prop = attrs.get('property') or ''
+                if name == 'description' and meta_description is None:
+                    meta_description = attrs.get('content') or ''
+                elif name == 'keywords' and meta_keywords is None:
+                    meta_keywords = attrs.get('content') or ''
+                if prop.startswith('og:'):
+                    content = attrs.get('content') or ''
+                    prop = prop[3:]
+                    if prop and content:
+                        og_data[f'og_{prop}'] = content
+            elif tag == 'title' and title is None:
+                title = _node_text(node)
         
-        # Meta description
-        desc_tag = soup.find('meta', attrs={'name': 'description'})
-        metadata['meta_description'] = desc_tag.get('content', "").strip() if desc_tag else ""
+        metadata = {}
         
-        # Keywords
-        keywords_tag = soup.find('meta', attrs={'name': 'keywords'})
-        if keywords_tag:
-            keywords = keywords_tag.get('content', "").split(',')
-            metadata['content_keywords'] = [k.strip() for k in keywords if k.strip()]
+        # Title and meta tags
+        metadata['title'] = title.strip() if title else ""
+        metadata['meta_description'] = meta_description.strip() if meta_description else ""
+        if meta_keywords is not None:
+            metadata['content_keywords'] = [k.strip() for k in meta_keywords.split(',') if k.strip()]
         else:
             metadata['content_keywords'] = []
         
-        # Content analysis
-        text_content = soup.get_text()
-        metadata['extracted_text'] = self._clean_text(text_content)[:1000]  # First 1000 chars
-        metadata['content_length'] = len(text_content)
+        # Content analysis: only the start of the text is kept, but its full length is counted
+        text_parts = []
+        sampled_length = 0
+        content_length = 0
+        for text in _iter_text(doc):
+            content_length += len(text)
+            if sampled_length < _TEXT_SAMPLE_LIMIT:
+                text_parts.append(text)
+                sampled_length += len(text)
+        metadata['extracted_text'] = self._clean_text(''.join(text_parts))[:1000]  # First 1000 chars
+        metadata['content_length'] = content_length
         
         # Media analysis
-        metadata['has_video'] = bool(soup.find(['video', 'iframe']) or 'youtube.com' in url or 'vimeo.com' in url)
-        metadata['has_forms'] = bool(soup.find('form'))
-        metadata['images_count'] = len(soup.find_all('img'))
+        metadata['has_video'] = bool(counts['video'] or counts['iframe'] or 'youtube.com' in url or 'vimeo.com' in url)
+        metadata['has_forms'] = bool(counts['form'])
+        metadata['images_count'] = counts['img']
         
         # Link analysis
-        links = soup.find_all('a', href=True)
-        metadata['links_count'] = len(links)
+        metadata['links_count'] = len(hrefs)
+        base_domain = urlparse(url).netloc
+        metadata['external_links_count'] = sum(1 for href in hrefs if self._is_external_link(href, base_domain))
+        
+        # Open Graph metadata
+        metadata.update(og_data)
+        
+        # Text structure analysis
+        heading_count = sum(counts[h] for h in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'))
+        list_count = counts['ul'] + counts['ol']
+        code_block_count = counts['code'] + counts['pre']
+        
+        metadata['paragraph_count'] = counts['p']
+        metadata['heading_count'] = heading_count
+        metadata['list_count'] = list_count
+        
+        # Content depth indicators
+        metadata['avg_paragraph_length'] = paragraph_text_length / counts['p'] if counts['p'] else 0
+        metadata['has_structured_content'] = bool(heading_count and list_count)
         
-        external_links = [link for link in links if self._is_external_link(link.get('href'), url)]
-        metadata['external_links_count'] = len(external_links)
+        # Technical content indicators
+        metadata['has_code'] = bool(code_block_count)
+        metadata['code_block_count'] = code_block_count
         
         return metadata
     
-    def _extract_youtube_metadata(self, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
+    def _extract_youtube_metadata(self, doc, url: str) -> Dict[str, Any]:
         """Extract YouTube-specific metadata"""
         metadata = {
             "youtube_title": "",
@@ -202,92 +770,48 @@ class EnhancedMetadataExtractor:
             "youtube_keywords": []
         }
         
-        if 'youtube.com' not in url and 'youtu.be' not in url:
-            return metadata
-        
         try:
             # YouTube title (multiple selectors for robustness)
-            title_selectors = [
-                'h1[class*="title"]',
-                'h1.ytd-video-primary-info-renderer',
-                'h1.ytd-watch-metadata',
-                'meta[property="og:title"]',
-                'title'
-            ]
-            
-            for selector in title_selectors:
-                title_elem = soup.select_one(selector)
+            for selector in _YT_TITLE_SELECTORS:
+                title_elem = _select_one(doc, selector)
                 if title_elem:
-                    if title_elem.name == 'meta':
-                        metadata['youtube_title'] = title_elem.get('content', '').strip()
+                    if _node_tag(title_elem) == 'meta':
+                        metadata['youtube_title'] = _node_attr(title_elem, 'content').strip()
                     else:
-                        metadata['youtube_title'] = title_elem.get_text().strip()
+                        metadata['youtube_title'] = _node_text(title_elem).strip()
                     if metadata['youtube_title']:
                         break
             
             # YouTube description
-            desc_selectors = [
-                'meta[name="description"]',
-                'meta[property="og:description"]',
-                '[class*="description"]',
-                '#description'
-            ]
-            
-            for selector in desc_selectors:
-                desc_elem = soup.select_one(selector)
+            for selector in _YT_DESCRIPTION_SELECTORS:
+                desc_elem = _select_one(doc, selector)
                 if desc_elem:
-                    if desc_elem.name == 'meta':
-                        metadata['youtube_description'] = desc_elem.get('content', '').strip()
+                    if _node_tag(desc_elem) == 'meta':
+                        metadata['youtube_description'] = _node_attr(desc_elem, 'content').strip()
                     else:
-                        metadata['youtube_description'] = desc_elem.get_text().strip()
+                        metadata['youtube_description'] = _node_text(desc_elem).strip()
                     if metadata['youtube_description']:
                         break
             
             # Channel information
-            channel_selectors = [
-                'link[itemprop="name"]',
-                '[class*="channel"]',
-                'meta[property="og:site_name"]'
-            ]
-            
-            for selector in channel_selectors:
-                channel_elem = soup.select_one(selector)
+            for selector in _YT_CHANNEL_SELECTORS:
+                channel_elem = _select_one(doc, selector)
                 if channel_elem:
-                    if channel_elem.name == 'meta':
-                        metadata['youtube_channel'] = channel_elem.get('content', '').strip()
-                    elif channel_elem.name == 'link':
-                        metadata['youtube_channel'] = channel_elem.get('href', '').strip()
+                    tag = _node_tag(channel_elem)
+                    if tag == 'meta':
+                        metadata['youtube_channel'] = _node_attr(channel_elem, 'content').strip()
+                    elif tag == 'link':
+                        metadata['youtube_channel'] = _node_attr(channel_elem, 'href').strip()
                     else:
-                        metadata['youtube_channel'] = channel_elem.get_text().strip()
+                        metadata['youtube_channel'] = _node_text(channel_elem).strip()
                     if metadata['youtube_channel']:
                         break
             
             # Extract keywords from content
             content_text = (metadata['youtube_title'] + " " + metadata['youtube_description']).lower()
             
-            # Educational keywords
-            educational_keywords = [
-                'tutorial', 'learn', 'course', 'education', 'explain', 'guide', 'how to',
-                'lesson', 'teaching', 'instruction', 'training', 'study', 'academic',
-                'university', 'college', 'research', 'analysis', 'theory', 'concept',
-                'algorithm', 'programming', 'coding', 'development', 'science',
-                'mathematics', 'physics', 'chemistry', 'biology', 'history',
-                'machine learning', 'data science', 'artificial intelligence',
-                'logistic regression', 'neural network', 'deep learning'
-            ]
-            
-            # Entertainment keywords  
-            entertainment_keywords = [
-                'funny', 'comedy', 'meme', 'cute', 'adorable', 'hilarious', 'lol',
-                'entertainment', 'fun', 'game', 'play', 'music video', 'vlog',
-                'reaction', 'prank', 'challenge', 'trend', 'viral', 'cat', 'dog',
-                'pet', 'animal compilation', 'fail', 'epic', 'awesome', 'cool',
-                'amazing', 'incredible', 'unbelievable', 'shocking'
-            ]
-            
-            # Count indicators
-            educational_count = sum(1 for keyword in educational_keywords if keyword in content_text)
-            entertainment_count = sum(1 for keyword in entertainment_keywords if keyword in content_text)
+            # Count educational vs entertainment indicators
+            educational_count, entertainment_count = _count_keyword_indicators(content_text)
             
             metadata['educational_indicators'] = educational_count
             metadata['entertainment_indicators'] = entertainment_count
@@ -314,80 +838,160 @@ class EnhancedMetadataExtractor:
         
         return metadata
     
-    def _extract_open_graph_metadata(self, soup: BeautifulSoup) -> Dict[str, Any]:
-        """Extract Open Graph metadata"""
-        og_data = {}
-        
-        og_tags = soup.find_all('meta', property=lambda x: x and x.startswith('og:'))
-        for tag in og_tags:
-            prop = tag.get('property', '').replace('og:', '')
-            content = tag.get('content', '')
-            if prop and content:
-                og_data[f'og_{prop}'] = content
-        
-        return og_data
-    
-    def _extract_content_analysis(self, soup: BeautifulSoup) -> Dict[str, Any]:
-        """Analyze content structure and quality"""
-        analysis = {}
-        
-        # Text structure analysis
-        paragraphs = soup.find_all('p')
-        headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        lists = soup.find_all(['ul', 'ol'])
-        
-        analysis['paragraph_count'] = len(paragraphs)
-        analysis['heading_count'] = len(headings)  
-        analysis['list_count'] = len(lists)
-        
-        # Content depth indicators
-        avg_paragraph_length = 0
-        if paragraphs:
-            total_length = sum(len(p.get_text()) for p in paragraphs)
-            avg_paragraph_length = total_length / len(paragraphs)
-        
-        analysis['avg_paragraph_length'] = avg_paragraph_length
-        analysis['has_structured_content'] = bool(headings and lists)
-        
-        # Technical content indicators
-        code_blocks = soup.find_all(['code', 'pre'])
-        analysis['has_code'] = bool(code_blocks)
-        analysis['code_block_count'] = len(code_blocks)
-        
-        return analysis
-    
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text content"""
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         # Remove non-printable characters
-        text = re.sub(r'[^\x20-\x7E]', '', text)
+        text = _NON_PRINTABLE_RE.sub('', text)
         return text.strip()
     
-    def _is_external_link(self, href: str, base_url: str) -> bool:
-        """Check if link is external"""
+    def _is_external_link(self, href: str, base_domain: str) -> bool:
+        """Check if link is external (base_domain is the page's netloc, parsed once per page)"""
+        # Relative links, fragments and mailto: etc. have no netloc; skip urlparse for them
+        if '//' not in href:
+            return False
         try:
-            base_domain = urlparse(base_url).netloc
             link_domain = urlparse(href).netloc
             return link_domain and link_domain != base_domain
         except:
             return False
     
     def _get_cache_key(self, url: str) -> str:
-        """Generate cache key for URL"""
-        return f"metadata_{hash(url)}"
+        """Generate cache key for URL (stable across processes, unlike hash())"""
+        return hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _get_cached_metadata(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get cached metadata if available and not expired"""
+        with self._cache_lock:
+            self._cache_frequency.increment(cache_key)
+            entry = self.metadata_cache.get(cache_key)
+            if entry is None:
+                return None
+            metadata, timestamp, is_negative = entry
+            ttl = self.negative_cache_ttl if is_negative else self.cache_ttl
+            if time.time() - timestamp >= ttl:
+                del self.metadata_cache[cache_key]
+                return None
+            self.metadata_cache.move_to_end(cache_key)
+            return metadata
+    
+    def _cache_metadata(self, cache_key: str, metadata: Dict[str, Any], is_negative: bool = False):
+        """Cache metadata, evicting the least recently used entry when full.
+        
+        A new entry only replaces the LRU victim if it has been requested more
+        often recently (TinyLFU admission); otherwise it is not cached.
+        Negative (fallback) entries never overwrite fresh real metadata.
+        """
+        with self._cache_lock:
+            entry = self.metadata_cache.get(cache_key)
+            if is_negative and entry is not None and not entry[2] and time.time() - entry[1] < self.cache_ttl:
+                return
+            if entry is None and len(self.metadata_cache) >= self.cache_max_size:
+                victim_key = next(iter(self.metadata_cache))
+                if self._cache_frequency.frequency(cache_key) <= self._cache_frequency.frequency(victim_key):
+                    return
+                self.metadata_cache.popitem(last=False)
+            self.metadata_cache[cache_key] = (metadata, time.time(), is_negative)
+            self.metadata_cache.move_to_end(cache_key)
+    
+    def _setup_disk_cache(self):
+        """Open the long-lived persistent cache connection (shared by all threads under _disk_lock)"""
+        self._disk_lock = threading.Lock()
+        self._disk_conn = None
+        try:
+            os.makedirs(os.path.dirname(self.disk_cache_path), exist_ok=True)
+            self._disk_conn = sqlite3.connect(self.disk_cache_path, check_same_thread=False)
+            # WAL so other proxy workers' reads don't block on our commits
+            self._disk_conn.execute("PRAGMA journal_mode=WAL")
+            with self._disk_lock, self._disk_conn as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS metadata_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        metadata TEXT,
+                        timestamp REAL
+                    )
+                """)
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning(f"Persistent metadata cache disabled: {e}")
+            if self._disk_conn is not None:
+                self._disk_conn.close()
+                self._disk_conn = None
+            self.disk_cache_path = None
+    
+    def _get_disk_metadata(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get metadata from the persistent cache if available and not expired"""
+        if self.disk_cache_path is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._disk_conn.execute(
+                    "SELECT metadata, timestamp FROM metadata_cache WHERE cache_key = ?",
+                    (cache_key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error reading persistent metadata cache: {e}")
+            return None
+        
+        if row is None or time.time() - row[1] >= self.disk_cache_ttl:
+            return None
+        return json.loads(row[0])
+    
+    def _store_disk_metadata(self, cache_key: str, metadata: Dict[str, Any]):
+        """Write metadata to the persistent cache, pruning it every 1000 writes"""
+        if self.disk_cache_path is None:
+            return
+        try:
+            with self._disk_lock, self._disk_conn as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO metadata_cache (cache_key, metadata, timestamp) VALUES (?, ?, ?)",
+                    (cache_key, json.dumps(metadata), time.time())
+                )
+                self._disk_writes += 1
+                if self._disk_writes % 1000 == 0:
+                    self._prune_disk_cache(conn)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error writing persistent metadata cache: {e}")
+    
+    def _prune_disk_cache(self, conn: sqlite3.Connection):
+        """Drop expired rows, then the oldest rows beyond disk_cache_max_rows"""
+        conn.execute("DELETE FROM metadata_cache WHERE timestamp < ?", (time.time() - self.disk_cache_ttl,))
+        conn.execute("""
+            DELETE FROM metadata_cache WHERE cache_key IN (
+                SELECT cache_key FROM metadata_cache ORDER BY timestamp DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.disk_cache_max_rows,))
     
     def shutdown(self):
-        """Shutdown the executor"""
+        """Shutdown the async client, its event loop and the executor"""
+        if self._loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self.aclient.aclose(), self._loop).result(timeout=5)
+            except Exception as e:
+                self.logger.warning(f"Error closing async HTTP client: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
         self.executor.shutdown(wait=True)
+        self.session.close()
+        if self._disk_conn is not None:
+            # Later lookups see the cache as disabled; a racing one gets a (caught) ProgrammingError
+            self.disk_cache_path = None
+            with self._disk_lock:
+                self._disk_conn.close()
 
 
 # Global instance
 _enhanced_metadata_extractor = None
+_extractor_lock = threading.Lock()
 
 def get_enhanced_metadata_extractor() -> EnhancedMetadataExtractor:
     """Get or create global enhanced metadata extractor instance"""
     global _enhanced_metadata_extractor
     if _enhanced_metadata_extractor is None:
-        _enhanced_metadata_extractor = EnhancedMetadataExtractor()
+        with _extractor_lock:
+            # Another thread may have created it while we waited for the lock
+            if _enhanced_metadata_extractor is None:
+                extractor = EnhancedMetadataExtractor()
+                atexit.register(extractor.shutdown)
+                _enhanced_metadata_extractor = extractor
     return _enhanced_metadata_extractor
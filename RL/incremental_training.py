@@ -10,10 +10,23 @@ import torch.nn as nn
 import json
 import logging
 import os
-import random
+import shutil
 from typing import List, Tuple
-from sklearn.model_selection import train_test_split
-from rl_filter import URLFeatureExtractor, ProductivityClassifier
+from rl_filter import (URLFeatureExtractor, ProductivityClassifier, stratified_split, extract_features_parallel,
+                       to_device, evaluate, compile_training_forward, training_autocast, grad_scaler,
+                       snapshot_state_dict)
+
+# Characters used in YouTube video IDs, as bytes for vectorised lookup
+_VIDEO_ID_CHARS = np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-", dtype=np.uint8)
+
+# Entertainment title templates and the words each one is filled with
+_ENTERTAINMENT_TITLE_TEMPLATES = (
+    ("Funny {} Compilation", ('Cat', 'Dog', 'Fails', 'Pranks')),
+    ("CRAZY {} Video!!!", ('Gaming', 'Reactions', 'Challenges')),
+    ("You Won't Believe What Happened...", ()),
+    ("Epic {} Moments", ('Dance', 'Music', 'Sports')),
+    ("Ultimate {} Collection", ('Memes', 'Vlogs', 'Drama')),
+)
 
 class IncrementalTrainer:
     """Incremental trainer that adds seed data to existing model knowledge"""
@@ -48,120 +61,149 @@ class IncrementalTrainer:
     def generate_training_examples(self, seed_data: dict) -> List[Tuple[dict, str, int]]:
         """Generate training examples from seed data"""
         examples = []
+        rng = np.random.default_rng()
         
-        missions = seed_data['missions']
+        missions = seed_data['missions'][:100]  # Use first 100 missions
         educational_channels = seed_data['educational_channels']
         entertainment_channels = seed_data['entertainment_channels'] 
         titles = seed_data['titles']
         
+        # URL-friendly channel names, computed once per channel
+        educational_slugs = [channel.lower().replace(' ', '') for channel in educational_channels]
+        entertainment_slugs = [channel.lower().replace(' ', '') for channel in entertainment_channels]
+        
         # Create positive examples (productive content)
         self.logger.info("Generating positive examples (educational content)...")
-        for i, mission in enumerate(missions[:100]):  # Use first 100 missions
-            # Educational YouTube videos
-            for _ in range(3):  # 3 examples per mission
-                channel = random.choice(educational_channels)
-                title = random.choice(titles)
-                
-                # Create realistic educational URLs
-                url_patterns = [
-                    f"https://www.youtube.com/watch?v={self._generate_video_id()}",
-                    f"https://github.com/{channel.lower().replace(' ', '')}/tutorial-{title.split()[2].lower()}",
-                    f"https://docs.{channel.lower().replace(' ', '')}.com/{title.split()[2].lower()}",
-                    f"https://{channel.lower().replace(' ', '')}.edu/course/{title.split()[3].lower()}",
-                    f"https://stackoverflow.com/questions/{random.randint(1000000, 9999999)}/{title.split()[2].lower()}-tutorial"
-                ]
-                
-                url = random.choice(url_patterns)
-                
-                metadata = {
-                    "url": url,
-                    "title": title,
-                    "meta_description": f"Learn {title.split()[3]} with {channel}",
-                    "content_keywords": title.split()[:5],
-                    "extracted_text": f"Educational content about {title.split()[3]}. " + 
-                                     f"This tutorial covers fundamental concepts and practical applications.",
-                    "domain": url.split('/')[2],
-                    "has_video": "youtube.com" in url,
-                    "has_forms": False,
-                    "content_length": 2500
-                }
-                
-                examples.append((metadata, mission, 1))  # 1 = productive
+        per_mission = 3  # 3 examples per mission
+        count = len(missions) * per_mission
+        
+        # Draw every random choice for this block up front
+        channel_idx = rng.integers(0, len(educational_channels), count)
+        title_idx = rng.integers(0, len(titles), count)
+        pattern_idx = rng.integers(0, 5, count)
+        question_ids = rng.integers(1000000, 10000000, count)
+        video_ids = self._generate_video_ids(rng, count)
+        
+        for j in range(count):
+            mission = missions[j // per_mission]
+            channel = educational_channels[channel_idx[j]]
+            slug = educational_slugs[channel_idx[j]]
+            title = titles[title_idx[j]]
+            words = title.split()
+            
+            # Create a realistic educational URL (only the chosen pattern is built)
+            pattern = int(pattern_idx[j])
+            if pattern == 0:
+                url = f"https://www.youtube.com/watch?v={video_ids[j]}"
+            elif pattern == 1:
+                url = f"https://github.com/{slug}/tutorial-{words[2].lower()}"
+            elif pattern == 2:
+                url = f"https://docs.{slug}.com/{words[2].lower()}"
+            elif pattern == 3:
+                url = f"https://{slug}.edu/course/{words[3].lower()}"
+            else:
+                url = f"https://stackoverflow.com/questions/{question_ids[j]}/{words[2].lower()}-tutorial"
+            
+            metadata = {
+                "url": url,
+                "title": title,
+                "meta_description": f"Learn {words[3]} with {channel}",
+                "content_keywords": words[:5],
+                "extracted_text": f"Educational content about {words[3]}. " + 
+                                 f"This tutorial covers fundamental concepts and practical applications.",
+                "domain": url.split('/')[2],
+                "has_video": pattern == 0,
+                "has_forms": False,
+                "content_length": 2500
+            }
+            
+            examples.append((metadata, mission, 1))  # 1 = productive
         
         # Create negative examples (entertainment/distracting content)
         self.logger.info("Generating negative examples (entertainment content)...")
-        for i, mission in enumerate(missions[:100]):  # Same missions for comparison
-            for _ in range(2):  # 2 distracting examples per mission
-                channel = random.choice(entertainment_channels)
-                
-                # Create realistic entertainment URLs
-                entertainment_urls = [
-                    f"https://www.youtube.com/watch?v={self._generate_video_id()}",
-                    f"https://www.reddit.com/r/memes/comments/{random.randint(100000, 999999)}/funny-cat-video",
-                    f"https://www.instagram.com/p/{self._generate_video_id()[:11]}/",
-                    f"https://www.tiktok.com/@{channel.lower().replace(' ', '')}",
-                    f"https://www.twitch.tv/{channel.lower().replace(' ', '')}/videos"
-                ]
-                
-                url = random.choice(entertainment_urls)
-                
-                # Entertainment titles
-                entertainment_titles = [
-                    f"Funny {random.choice(['Cat', 'Dog', 'Fails', 'Pranks'])} Compilation",
-                    f"CRAZY {random.choice(['Gaming', 'Reactions', 'Challenges'])} Video!!!",
-                    f"You Won't Believe What Happened...",
-                    f"Epic {random.choice(['Dance', 'Music', 'Sports'])} Moments",
-                    f"Ultimate {random.choice(['Memes', 'Vlogs', 'Drama'])} Collection"
-                ]
-                
-                title = random.choice(entertainment_titles)
-                
-                metadata = {
-                    "url": url,
-                    "title": title,
-                    "meta_description": f"Entertainment video from {channel}",
-                    "content_keywords": title.split()[:3],
-                    "extracted_text": f"Entertainment content. {title}. " +
-                                     "Like and subscribe for more fun videos!",
-                    "domain": url.split('/')[2],
-                    "has_video": True,
-                    "has_forms": False,
-                    "content_length": 150
-                }
-                
-                examples.append((metadata, mission, 0))  # 0 = distracting
+        per_mission = 2  # 2 distracting examples per mission (same missions for comparison)
+        count = len(missions) * per_mission
+        
+        channel_idx = rng.integers(0, len(entertainment_channels), count)
+        pattern_idx = rng.integers(0, 5, count)
+        post_ids = rng.integers(100000, 1000000, count)
+        video_ids = self._generate_video_ids(rng, count)
+        template_idx = rng.integers(0, len(_ENTERTAINMENT_TITLE_TEMPLATES), count)
+        word_draws = rng.random(count)
+        
+        for j in range(count):
+            mission = missions[j // per_mission]
+            channel = entertainment_channels[channel_idx[j]]
+            slug = entertainment_slugs[channel_idx[j]]
+            
+            # Create a realistic entertainment URL
+            pattern = int(pattern_idx[j])
+            if pattern == 0:
+                url = f"https://www.youtube.com/watch?v={video_ids[j]}"
+            elif pattern == 1:
+                url = f"https://www.reddit.com/r/memes/comments/{post_ids[j]}/funny-cat-video"
+            elif pattern == 2:
+                url = f"https://www.instagram.com/p/{video_ids[j]}/"
+            elif pattern == 3:
+                url = f"https://www.tiktok.com/@{slug}"
+            else:
+                url = f"https://www.twitch.tv/{slug}/videos"
+            
+            # Entertainment title
+            template, choices = _ENTERTAINMENT_TITLE_TEMPLATES[template_idx[j]]
+            title = template.format(choices[int(word_draws[j] * len(choices))]) if choices else template
+            
+            metadata = {
+                "url": url,
+                "title": title,
+                "meta_description": f"Entertainment video from {channel}",
+                "content_keywords": title.split()[:3],
+                "extracted_text": f"Entertainment content. {title}. " +
+                                 "Like and subscribe for more fun videos!",
+                "domain": url.split('/')[2],
+                "has_video": True,
+                "has_forms": False,
+                "content_length": 150
+            }
+            
+            examples.append((metadata, mission, 0))  # 0 = distracting
         
         self.logger.info(f"Generated {len(examples)} training examples")
         return examples
     
-    def _generate_video_id(self) -> str:
-        """Generate a realistic YouTube video ID"""
-        chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-"
-        return ''.join(random.choice(chars) for _ in range(11))
+    def _generate_video_ids(self, rng: np.random.Generator, count: int) -> List[str]:
+        """Generate count realistic YouTube video IDs from one random draw"""
+        indices = rng.integers(0, len(_VIDEO_ID_CHARS), size=(count, 11))
+        ids = _VIDEO_ID_CHARS[indices].tobytes().decode('ascii')
+        return [ids[k * 11:(k + 1) * 11] for k in range(count)]
     
     def extract_features_from_examples(self, examples: List[Tuple[dict, str, int]]) -> Tuple[np.ndarray, np.ndarray]:
         """Extract features from training examples"""
-        features_list = []
-        labels_list = []
-        
         self.logger.info("Extracting features from examples...")
         
-        for i, (metadata, mission, label) in enumerate(examples):
+        all_metadata = []
+        all_missions = []
+        all_labels = []
+        
+        # Validate examples up front so a malformed one is skipped instead of failing the batch
+        for i, example in enumerate(examples):
             try:
-                # Extract features using the same method as the main system
-                features = self.feature_extractor.extract_features_from_metadata(metadata, mission)
-                features_list.append(features)
-                labels_list.append(label)
-                
-                if (i + 1) % 100 == 0:
-                    self.logger.info(f"Processed {i + 1}/{len(examples)} examples")
-                    
+                metadata, mission, label = example
+                if not isinstance(metadata.get("url", ""), str) or not isinstance(mission, str):
+                    raise TypeError("url and mission must be strings")
+                label = float(label)
             except Exception as e:
-                self.logger.warning(f"Error extracting features for example {i}: {e}")
+                self.logger.warning(f"Skipping malformed example {i}: {e}")
                 continue
+            
+            all_metadata.append(metadata)
+            all_missions.append(mission)
+            all_labels.append(label)
         
-        features_array = np.array(features_list)
-        labels_array = np.array(labels_list)
+        # Batched extraction (mission features shared per mission), split across worker
+        # processes for large example sets
+        features_array = extract_features_parallel(all_metadata, all_missions)
+        labels_array = np.array(all_labels, dtype=np.float32)
         
         self.logger.info(f"Feature extraction complete: {features_array.shape[0]} examples, {features_array.shape[1]} features")
         return features_array, labels_array
@@ -204,28 +246,36 @@ class IncrementalTrainer:
     
     def train_incrementally(self, features: np.ndarray, labels: np.ndarray) -> ProductivityClassifier:
         """Train model incrementally with seed data"""
-        # Convert to tensors
-        features_tensor = torch.tensor(features, dtype=torch.float32)
-        labels_tensor = torch.tensor(labels, dtype=torch.float32)
+        # Convert to tensors (shares memory when the arrays are already contiguous float32)
+        features_tensor = torch.from_numpy(np.ascontiguousarray(features, dtype=np.float32))
+        labels_tensor = torch.from_numpy(np.ascontiguousarray(labels, dtype=np.float32))
         
-        # Split data for validation
-        X_train, X_val, y_train, y_val = train_test_split(
-            features_tensor, labels_tensor,
-            test_size=0.2,
-            random_state=42,
-            stratify=labels_tensor
-        )
+        # Split data for validation (split indices only; the tensors are gathered once below)
+        train_idx, val_idx = stratified_split(labels_tensor.numpy(), test_size=0.2, seed=42)
         
-        self.logger.info(f"Training set: {X_train.shape[0]} examples")
-        self.logger.info(f"Validation set: {X_val.shape[0]} examples")
+        self.logger.info(f"Training set: {len(train_idx)} examples")
+        self.logger.info(f"Validation set: {len(val_idx)} examples")
+        
+        # The whole dataset fits on the device: move it once instead of once per batch.
+        # Labels become (N, 1) columns to match the model output, so no per-step squeeze.
+        features_tensor = to_device(features_tensor, self.device)
+        labels_tensor = to_device(labels_tensor, self.device).unsqueeze(-1)
+        train_idx = torch.from_numpy(train_idx).to(self.device)
+        val_idx = torch.from_numpy(val_idx).to(self.device)
+        X_train, X_val = features_tensor[train_idx], features_tensor[val_idx]
+        y_train, y_val = labels_tensor[train_idx], labels_tensor[val_idx]
         
         # Load existing model
         model = self.load_existing_model()
         
+        train_logits = compile_training_forward(model, self.device)
+        
         # Training setup with lower learning rate for incremental training
         optimizer = torch.optim.Adam(model.parameters(), lr=self.learning_rate, weight_decay=1e-5)
         scheduler = torch.optim.lr_scheduler.StepLR(optimizer, step_size=2, gamma=0.8)
-        loss_function = nn.BCELoss()
+        loss_function = nn.BCEWithLogitsLoss()  # Sigmoid fused into the loss
+        
+        scaler = grad_scaler(self.device)
         
         best_val_accuracy = 0.0
         best_model_state = None
@@ -236,35 +286,35 @@ class IncrementalTrainer:
         for epoch in range(self.epochs):
             # Training phase
             model.train()
-            total_loss = 0
+            total_loss = 0.0
+            batches_done = 0
             
-            num_batches = len(X_train) // self.batch_size
+            # Fresh batch order every epoch, drawn on the device the data lives on
+            perm = torch.randperm(X_train.shape[0], device=X_train.device)
             for i in range(0, len(X_train), self.batch_size):
-                batch_features = X_train[i:i+self.batch_size]
-                batch_labels = y_train[i:i+self.batch_size]
+                idx = perm[i:i+self.batch_size]
+                batch_features = X_train.index_select(0, idx)
+                batch_labels = y_train.index_select(0, idx)
                 
                 # Forward pass
-                predictions = model(batch_features)
-                loss = loss_function(predictions.squeeze(), batch_labels)
+                with training_autocast(self.device):
+                    predictions = train_logits(batch_features)
+                    loss = loss_function(predictions, batch_labels)
                 
                 # Backward pass
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
+                optimizer.zero_grad(set_to_none=True)
+                scaler.scale(loss).backward()
+                scaler.step(optimizer)
+                scaler.update()
                 
                 total_loss += loss.item()
+                batches_done += 1
             
-            avg_loss = total_loss / num_batches
+            avg_loss = total_loss / batches_done
             
             # Validation phase
             model.eval()
-            with torch.no_grad():
-                val_predictions = model(X_val)
-                val_loss = loss_function(val_predictions.squeeze(), y_val)
-                
-                # Calculate accuracy
-                predicted_labels = (val_predictions.squeeze() > 0.5).float()
-                accuracy = (predicted_labels == y_val).float().mean()
+            val_loss, accuracy = evaluate(model, X_val, y_val, loss_function)
             
             scheduler.step()
             
@@ -276,7 +326,7 @@ class IncrementalTrainer:
             # Save best model
             if accuracy > best_val_accuracy:
                 best_val_accuracy = accuracy
-                best_model_state = model.state_dict().copy()
+                best_model_state = snapshot_state_dict(model)
                 self.logger.info(f"    ✨ New best accuracy: {accuracy:.4f}")
         
         # Restore best model state
@@ -290,13 +340,13 @@ class IncrementalTrainer:
         model_path = os.path.join(os.path.dirname(__file__), "best_pretrained_model.pth")
         backup_path = os.path.join(os.path.dirname(__file__), "previous_model_backup.pth")
         
-        # Backup existing model first
+        # Backup existing model first (a raw file copy, no need to deserialize it)
         if os.path.exists(model_path):
-            torch.save(torch.load(model_path), backup_path)
+            shutil.copyfile(model_path, backup_path)
             self.logger.info(f"💾 Previous model backed up to {backup_path}")
         
         # Save updated model
-        torch.save(model.state_dict(), model_path)
+        torch.save(model.state_dict(), model_path, pickle_protocol=4)
         
         self.logger.info(f"🚀 Updated model saved!")
         self.logger.info(f"📊 Final validation accuracy: {accuracy:.4f}")
@@ -6,51 +6,77 @@ import sqlite3
 import logging
 from typing import List, Tuple
 import time
-from rl_filter import RLFilter, URLFeatureExtractor
+from rl_filter import (RLFilter, URLFeatureExtractor, FEATURE_SIZE, FEATURE_VERSION, stratified_split, to_device, evaluate,
+                       compile_training_forward, training_autocast, grad_scaler, snapshot_state_dict)
 import os
+import hashlib
 import json
-from sklearn.model_selection import train_test_split
 
 
-with open(os.path.join(os.path.dirname(__file__), "rl_pretraining_data.json"), "r") as f: #os.join path ... just makes it such that both files can coordinate together, r just open the data in reading mode, and f is a short name for file
-    rl_pretraining_data = json.load(f)
+with open(os.path.join(os.path.dirname(__file__), "rl_pretraining_data.json"), "rb") as f: #os.join path ... just makes it such that both files can coordinate together, rb opens the raw bytes (hashed for the cache below), and f is a short name for file
+    raw_data = f.read()
 
-print(f"Total examples loaded: {len(rl_pretraining_data['examples'])}")
-print("First sample keys:", rl_pretraining_data['examples'][0].keys())
+# Extracted features are cached per version of the data file and of the feature
+# extractor, so reruns skip extraction (the hashed text features are deterministic)
+data_key = hashlib.sha1(raw_data).hexdigest()[:16]
+features_cache_path = os.path.join(os.path.dirname(__file__), f"features_cache_{data_key}_{FEATURE_SIZE}_v{FEATURE_VERSION}.npz")
 
-feature_extractor = URLFeatureExtractor()
+if os.path.exists(features_cache_path):
+    with np.load(features_cache_path) as cached:
+        all_features = cached['features']
+        all_labels = cached['labels']
+    print(f"Loaded cached features from {features_cache_path}")
+else:
+    rl_pretraining_data = json.loads(raw_data)
 
-all_features = []
-all_labels = []
+    print(f"Total examples loaded: {len(rl_pretraining_data['examples'])}")
+    print("First sample keys:", rl_pretraining_data['examples'][0].keys())
 
+    feature_extractor = URLFeatureExtractor()
 
-for i, example in enumerate(rl_pretraining_data['examples']):
-    features = feature_extractor.extract_features(example['url'], example['mission'])
-    all_features.append(features)
+    # Extract every example in one batched call (mission features are shared per mission)
+    examples = rl_pretraining_data['examples']
+    all_features = feature_extractor.extract_features_batch(
+        [feature_extractor.create_basic_metadata(example['url']) for example in examples],
+        [example['mission'] for example in examples]
+    )
+    all_labels = np.array([example.get('label') for example in examples], dtype=np.float32)
 
-    label = example.get('label')
-    all_labels.append(label)
+    np.savez(features_cache_path, features=all_features, labels=all_labels)
+    print(f"Cached features to {features_cache_path}")
 
 print(f"processed {len(all_features)} examples")
 print(f"feature vector size: {all_features[0].shape} examples")
 print(f"Labels: {np.sum(all_labels)} productive, {len(all_labels) - np.sum(all_labels)} distracting")
 
-features_tensor = torch.tensor(np.array(all_features), dtype=torch.float32)
-label_tensor = torch.tensor(all_labels, dtype=torch.float32)
+# Zero-copy: both arrays are already contiguous float32
+features_tensor = torch.from_numpy(all_features)
+label_tensor = torch.from_numpy(all_labels)
 
 print(f"features tensor shape: {features_tensor.shape}")
 print(f"labels tensor shape: {label_tensor.shape}")
 
-# Split data into training and testing sets (80/20 split)
-X_train, X_test, y_train, y_test = train_test_split(
-    features_tensor, label_tensor, 
+# Split data into training and testing sets (80/20 split) - only the indices are split
+# (stratified: keeps the same ratio of productive/distracting in both sets)
+train_idx, test_idx = stratified_split(
+    all_labels,
     test_size=0.2,     # 20% for testing
-    random_state=42,   # Reproducible results
-    stratify=label_tensor  # Keep same ratio of productive/distracting in both sets
+    seed=42            # Reproducible results
 )
 
-print(f"Training set: {X_train.shape[0]} examples")
-print(f"Testing set: {X_test.shape[0]} examples")
+print(f"Training set: {len(train_idx)} examples")
+print(f"Testing set: {len(test_idx)} examples")
+
+# Train on the GPU when there is one; the whole dataset is moved there once
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+features_tensor = to_device(features_tensor, device)
+label_tensor = to_device(label_tensor, device)
+
+# Gather each split where the data lives; labels as (N, 1) columns to match the model output, so the loss needs no squeeze
+train_idx = torch.from_numpy(train_idx).to(device)
+test_idx = torch.from_numpy(test_idx).to(device)
+X_train, X_test = features_tensor[train_idx], features_tensor[test_idx]
+y_train, y_test = label_tensor[train_idx].unsqueeze(-1), label_tensor[test_idx].unsqueeze(-1)
 
 class ProductivityClassifier(nn.Module):
     def __init__(self, input_size):
@@ -63,27 +89,36 @@ class ProductivityClassifier(nn.Module):
         self.dropout = nn.Dropout(0.2)
         self.sigmoid = nn.Sigmoid()
 
-    def forward(self, x):
+    def logits(self, x):
         x = self.relu(self.fc1(x))      # Input → Layer 1 → ReLU activation, (changes negatives to 0)
         x = self.dropout(x)             # sets some elements to 0 to prevent overfitting
         x = self.relu(self.fc2(x))      # Layer 1 → Layer 2 → ReLU activation  
         x = self.dropout(x)             # Apply dropout (training only)
         x = self.relu(self.fc3(x))      # Layer 2 → Layer 3 → ReLU activation
-        x = self.sigmoid(self.fc4(x))   # Layer 3 → Output → Sigmoid (0-1 probability)
-        return x
+        return self.fc4(x)              # Layer 3 → Output (raw score, before sigmoid)
+
+    def forward(self, x):
+        return self.sigmoid(self.logits(x))  # Sigmoid (0-1 probability)
 
 # Create the model
 input_size = features_tensor.shape[1]  # Number of features per example
-model = ProductivityClassifier(input_size)
+model = ProductivityClassifier(input_size).to(device)
 print(f"Model created with input size: {input_size}")
 
-optimizer = torch.optim.Adam(model.parameters(), lr=0.001)#Adam is a type of optimizer that helps the model learn faster and more efficiently
-loss_function = nn.BCELoss() #for each prediction measure how wrong the models prediction is
+train_logits = compile_training_forward(model, device) #the forward pass used for training (compiled on the GPU), weights are still saved from model
+
+batch_size = 1024 #how many examples to process at once (large batches keep the GPU busy with a few big matmuls)
+learning_rate = 0.001 * (batch_size / 32) ** 0.5 #scaled up from the 0.001 tuned for batch size 32 (square-root rule)
+
+optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)#Adam is a type of optimizer that helps the model learn faster and more efficiently
+loss_function = nn.BCEWithLogitsLoss() #for each prediction measure how wrong the models prediction is (sigmoid is fused into the loss)
 epochs = 10 #an epoch is a full pass through the training data
-batch_size = 32 #how many examples to process at once
+eval_batch_size = 4096 #how many test examples to evaluate at once
 
 print(f"Training model for {epochs} epochs with batch size {batch_size}") #the f at the beginning just allows you to include variables with curly brackets
 
+scaler = grad_scaler(device) #scales the loss so fp16 gradients don't underflow when training on the GPU
+
 # Track best model
 best_test_loss = float('inf')
 best_model_state = None
@@ -94,44 +129,43 @@ for epoch in range(epochs):
     total_loss = 0 #accumulates loss over the epoch
 
     #process data in batches (use training data only)
-    num_batches = len(X_train) // batch_size
+    num_batches = (len(X_train) + batch_size - 1) // batch_size #includes the last, partial batch
+    perm = torch.randperm(X_train.shape[0], device=X_train.device) #shuffles the training order every epoch (on the same device as the data)
     for batch_idx, i in enumerate(range(0, len(X_train), batch_size)): #range(start, stop, step)
-        batch_features = X_train[i:i+batch_size] #splits the features into batches of size batch_size
-        batch_labels = y_train[i:i+batch_size] #splits the labels into batches of size batch_size
+        idx = perm[i:i+batch_size] #the shuffled indices of this batch
+        batch_features = X_train.index_select(0, idx) #gathers the features of the batch, batch_size rows at a time
+        batch_labels = y_train.index_select(0, idx) #gathers the matching labels
 
-        #forward pass
-        predictions = model(batch_features) #feeds 32 examples through the nueral network, outputs 32 predictions
-        loss = loss_function(predictions.squeeze(), batch_labels) #calculates the loss between the predictions and the actual labels
+        #forward pass (in fp16 under autocast when training on the GPU)
+        with training_autocast(device):
+            predictions = train_logits(batch_features) #feeds batch_size examples through the nueral network, outputs batch_size predictions
+            loss = loss_function(predictions, batch_labels) #calculates the loss between the predictions and the actual labels
 
         #backward pass
-        optimizer.zero_grad()#resets the gradient, which is just a volatile calculation
-        loss.backward()#uses backpropagation to calculate the gradient of the loss function with respect to the model parameters
-        optimizer.step()#updates the model parameters based on the gradient
+        optimizer.zero_grad(set_to_none=True)#resets the gradient, which is just a volatile calculation (drops the buffers instead of zero-filling them)
+        scaler.scale(loss).backward()#uses backpropagation to calculate the gradient of the (scaled) loss with respect to the model parameters
+        scaler.step(optimizer)#unscales the gradients and updates the model parameters (skipped if they overflowed)
+        scaler.update()#adjusts the loss scale for the next batch
          
         total_loss += loss.item()
         
-        # Show progress every 1000 batches
-        if (batch_idx + 1) % 1000 == 0:
+        # Show progress every 100 batches
+        if (batch_idx + 1) % 100 == 0:
             print(f"    Batch {batch_idx + 1}/{num_batches}, Current Loss: {loss.item():.4f}")
 
-    avg_loss = total_loss / (len(X_train) / batch_size)
+    avg_loss = total_loss / num_batches
     
     # Test on testing data (no training, just evaluation)
     model.eval()  # Turn off dropout for testing
-    with torch.no_grad():  # Don't calculate gradients for testing
-        test_predictions = model(X_test)
-        test_loss = loss_function(test_predictions.squeeze(), y_test)
-        
-        # Calculate accuracy
-        predicted_labels = (test_predictions.squeeze() > 0.5).float()
-        accuracy = (predicted_labels == y_test).float().mean()
+    # Evaluated in chunks (no gradients tracked) so memory stays flat however large the test set is
+    test_loss, accuracy = evaluate(model, X_test, y_test, loss_function, eval_batch_size)
     
     print(f"Epoch [{epoch+1}/{epochs}], Train Loss: {avg_loss:.4f}, Test Loss: {test_loss:.4f}, Test Accuracy: {accuracy:.4f}")
     
     # Save best model based on test loss
     if test_loss < best_test_loss:
         best_test_loss = test_loss
-        best_model_state = model.state_dict().copy()
+        best_model_state = snapshot_state_dict(model)
         print(f"    → New best model! Test loss: {test_loss:.4f}")
 
 print("Training completed!")
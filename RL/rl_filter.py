@@ -6,6 +6,7 @@ Replaces threshold-based filtering with adaptive learning
 
 import numpy as np
 import sqlite3
+import atexit
 import json
 import time
 import logging
@@ -13,22 +14,134 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import random
-from collections import deque
+from collections import deque, OrderedDict
 from datetime import datetime
 from typing import Tuple, List, Optional, Dict
 import threading
+import queue
 import os
 import re
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import shared_memory
 try:
-    from .enhanced_metadata_extractor import get_enhanced_metadata_extractor
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+try:
+    from .enhanced_metadata_extractor import get_enhanced_metadata_extractor, _user_cache_dir
 except ImportError:
     # Fallback for when running as script (not as package)
-    from enhanced_metadata_extractor import get_enhanced_metadata_extractor
+    from enhanced_metadata_extractor import get_enhanced_metadata_extractor, _user_cache_dir
+
+# Feature vector length: 384+384+384+15+15+4
+FEATURE_SIZE = 1186
+# Bump whenever feature values change (e.g. hashing scheme) so cached feature
+# matrices are rebuilt and models are retrained on the new values
+FEATURE_VERSION = 2
+
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7f]+')
+_URL_MARKER_RE = re.compile(r'https|www|\.com|\.org|\.edu|\.gov')
+
+# Keyword groups scanned in one Aho-Corasick pass per text (see _term_group_counts)
+_URL_TERM_GROUPS = (
+    ('youtube',), ('reddit',), ('github',), ('stackoverflow',), ('wikipedia',), ('docs',),
+    ('learn',), ('tutorial',), ('course',), ('video',), ('watch',), ('search',),
+    ('api', 'doc', 'guide'), ('game', 'play', 'fun'),
+)
+_MISSION_TERM_GROUPS = (
+    ('learn', 'study', 'understand', 'master', 'tutorial'),     # learning
+    ('work', 'job', 'project', 'task', 'complete'),             # work
+    ('create', 'build', 'develop', 'design', 'make'),           # creative
+    ('research', 'find', 'information', 'data', 'explore'),     # research
+    ('skill', 'practice', 'improve', 'training', 'course'),     # skill
+)
+_CONTENT_TERM_GROUPS = (
+    ('title', 'heading', 'header'),                             # title
+    ('description', 'summary', 'about'),                        # description
+    ('tutorial', 'guide', 'how to', 'step'),                    # tutorial
+    ('documentation', 'docs', 'api', 'reference'),              # documentation
+    ('learn', 'course', 'lesson', 'education'),                 # learning
+    ('code', 'function'),                                       # has code
+)
+
+def _build_term_automaton(groups):
+    """Aho-Corasick automaton mapping each term to (group index, term); None without pyahocorasick"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for index, group in enumerate(groups):
+        for term in group:
+            automaton.add_word(term, (index, term))
+    automaton.make_automaton()
+    return automaton
+
+_URL_TERM_AUTOMATON = _build_term_automaton(_URL_TERM_GROUPS)
+_MISSION_TERM_AUTOMATON = _build_term_automaton(_MISSION_TERM_GROUPS)
+_CONTENT_TERM_AUTOMATON = _build_term_automaton(_CONTENT_TERM_GROUPS)
+
+def _term_group_counts(automaton, groups, text: str, distinct: bool) -> List[int]:
+    """Per group, how many distinct terms occur in text (distinct) or how many times they occur.
+    
+    Occurrence counts equal str.count because none of the terms can overlap itself.
+    """
+    counts = [0] * len(groups)
+    if automaton is None:
+        for index, group in enumerate(groups):
+            counts[index] = sum((1 if term in text else 0) if distinct else text.count(term) for term in group)
+    elif distinct:
+        for index, _ in {value for _, value in automaton.iter(text)}:
+            counts[index] += 1
+    else:
+        for _, (index, _) in automaton.iter(text):
+            counts[index] += 1
+    return counts
+
+def _char_class_counts(text: str) -> Tuple[np.ndarray, int, int, int]:
+    """Byte histogram of the ASCII characters in text plus alpha/digit/non-alnum counts.
+
+    The counts match str.isalpha/isdigit/isalnum; only the (usually rare)
+    non-ASCII characters are classified in Python.
+    """
+    hist = np.bincount(np.frombuffer(text.encode('ascii', 'ignore'), dtype=np.uint8), minlength=128)
+    alpha = int(hist[65:91].sum() + hist[97:123].sum())
+    digit = int(hist[48:58].sum())
+    alnum = alpha + digit
+    if not text.isascii():
+        extra = ''.join(_NON_ASCII_RE.findall(text))
+        alpha += sum(1 for c in extra if c.isalpha())
+        digit += sum(1 for c in extra if c.isdigit())
+        alnum += sum(1 for c in extra if c.isalnum())
+    return hist, alpha, digit, len(text) - alnum
+
+def _word_length_stats(words: List[str]) -> Tuple[float, int, int]:
+    """Average length, longest length and number of words longer than 10 characters"""
+    if not words:
+        return 0.0, 0, 0
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    return int(lengths.sum()) / len(words), int(lengths.max()), int(np.count_nonzero(lengths > 10))
+
+def _hash_features(tag: bytes, tokens: List[str], out: np.ndarray) -> np.ndarray:
+    """Fill out with features in [0, 1] from one SHAKE-256 digest of the tokens.
+
+    Unlike hash(), the digest is not salted per process, so the same text
+    maps to the same features in training and in the proxy.
+    """
+    digest = hashlib.shake_256(tag + b'\x00' + ' '.join(tokens).encode('utf-8', 'ignore')).digest(2 * len(out))
+    return np.multiply(np.frombuffer(digest, dtype=np.uint16), np.float32(1.0 / 65535.0), out=out, casting='unsafe')
 
 class URLFeatureExtractor:
     """Extract features from URLs for RL agent"""
     
+    # Time features change at most once an hour; share them across instances for a second
+    _time_cache = (0.0, None)  # (time.monotonic() when computed, read-only feature vector)
+    _time_cache_lock = threading.Lock()
+    
     def __init__(self):
         # Pure numerical feature extraction - no hardcoded rules
         # Let the pretrained model learn what's productive vs distracting
@@ -36,8 +149,11 @@ class URLFeatureExtractor:
         
     def extract_features(self, url: str, mission: str) -> np.ndarray:
         """Extract feature vector from URL and mission (basic version)"""
-        # Create minimal metadata for compatibility
-        metadata = {
+        return self.extract_features_from_metadata(self.create_basic_metadata(url), mission)
+    
+    def create_basic_metadata(self, url: str) -> dict:
+        """Create minimal metadata for a bare URL"""
+        return {
             "url": url,
             "title": "",
             "meta_description": "",
@@ -48,176 +164,198 @@ class URLFeatureExtractor:
             "has_forms": False,
             "content_length": 0
         }
-        return self.extract_features_from_metadata(metadata, mission)
     
-    def extract_features_from_metadata(self, metadata: dict, mission: str) -> np.ndarray:
-        """Extract feature vector from universal metadata and mission"""
+    def extract_features_from_metadata(self, metadata: dict, mission: str,
+                                       mission_features: Optional[np.ndarray] = None) -> np.ndarray:
+        """Extract feature vector from universal metadata and mission.
+        
+        mission_features may be passed in when the caller has already computed
+        _extract_mission_text_features(mission).
+        """
+        if mission_features is None:
+            mission_features = self._extract_mission_text_features(mission)
+        features = np.empty(FEATURE_SIZE, dtype=np.float32)
+        self._write_features(features, metadata, mission, mission_features,
+                             self._extract_time_features())
+        return features
+    
+    def extract_features_batch(self, metadatas: List[dict], missions: List[str],
+                               mission_features: Optional[Dict[str, np.ndarray]] = None,
+                               out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Extract an (N, FEATURE_SIZE) feature matrix for many examples at once.
+        
+        Mission features are computed once per distinct mission (or taken from
+        the mission_features mapping) and time features once per batch; rows are
+        written straight into the output matrix (out, if given).
+        """
+        features = np.empty((len(metadatas), FEATURE_SIZE), dtype=np.float32) if out is None else out
+        if not metadatas:
+            return features
+        mission_features = dict(mission_features or {})
+        time_features = self._extract_time_features()
+        url_lowers = [metadata.get("url", "").lower() for metadata in metadatas]
+        dynamic_url_features = self._extract_dynamic_url_features_batch(metadatas, url_lowers)
+        features[:, 1167:1182] = self._extract_content_features_batch(metadatas)
+        
+        for row, metadata, mission, dynamic_row, url_lower in zip(features, metadatas, missions,
+                                                                   dynamic_url_features, url_lowers):
+            if mission not in mission_features:
+                mission_features[mission] = self._extract_mission_text_features(mission)
+            self._write_features(row, metadata, mission, mission_features[mission], time_features,
+                                 dynamic_row, url_lower, content_features_written=True)
+        
+        return features
+    
+    def _write_features(self, out: np.ndarray, metadata: dict, mission: str,
+                        mission_features: np.ndarray, time_features: np.ndarray,
+                        dynamic_url_features: Optional[np.ndarray] = None,
+                        url_lower: Optional[str] = None, content_features_written: bool = False):
+        """Fill a FEATURE_SIZE row in place (url_lower: the metadata URL already lower-cased;
+        content_features_written: out[1167:1182] was already filled by _extract_content_features_batch)"""
         url = metadata.get("url", "")
+        if url_lower is None:
+            url_lower = url.lower()
         
         # Create content text from metadata
         content_text = self._create_content_text_from_metadata(metadata, mission)
         
         # Generate simple text-based features (NO EXTERNAL MODELS)
-        url_features_simple = self._extract_url_text_features(url)        # 384 dims
-        mission_features_simple = self._extract_mission_text_features(mission)  # 384 dims  
-        content_features_simple = self._extract_content_text_features(content_text)  # 384 dims
+        self._extract_url_text_features(url, out[0:384], url_lower)        # URL text features (384 dims)
+        out[384:768] = mission_features                                     # Mission text features (384 dims)
+        self._extract_content_text_features(content_text, out[768:1152])   # Content text features (384 dims)
         
         # Dynamic URL characteristics (no hardcoded platforms)
-        url_features = self._extract_dynamic_url_features(metadata)
+        if dynamic_url_features is None:
+            self._extract_dynamic_url_features(metadata, url_lower, out[1152:1167])  # 15 dims
+        else:
+            out[1152:1167] = dynamic_url_features                           # 15 dims
         
         # Content features from metadata
-        content_features = self._extract_content_features(metadata, mission)
+        if not content_features_written:
+            self._extract_content_features(metadata, mission, out[1167:1182])  # 15 dims
         
         # Time features
-        time_features = self._extract_time_features()
-        
-        # Combine all features (maintain 1181 dimensions for pretrained model)
-        features = np.concatenate([
-            url_features_simple,       # URL text features (384 dims)
-            mission_features_simple,   # Mission text features (384 dims)  
-            content_features_simple,   # Content text features (384 dims)
-            url_features,              # Dynamic URL features (15 dims)
-            content_features,          # Content-based features (10 dims)
-            time_features              # Time features (4 dims)
-        ])
-        
-        return features
+        out[1182:1186] = time_features                                      # 4 dims
     
-    def _extract_url_text_features(self, url: str) -> np.ndarray:
-        """Extract 384-dimensional text features from URL without external models"""
-        features = []
-        url_lower = url.lower()
+    def _extract_url_text_features(self, url: str, out: Optional[np.ndarray] = None,
+                                   url_lower: Optional[str] = None) -> np.ndarray:
+        """Extract 384-dimensional text features from URL without external models (into out if given)"""
+        if out is None:
+            out = np.empty(384, dtype=np.float32)
+        if url_lower is None:
+            url_lower = url.lower()
         
         # Basic URL characteristics (50 features)
-        features.extend([
-            len(url), len(url_lower.split('/')), len(url_lower.split('.')),
-            url_lower.count('/'), url_lower.count('?'), url_lower.count('&'),
-            url_lower.count('='), url_lower.count('-'), url_lower.count('_'),
-            url_lower.count('%'), len(url_lower.split('?')[0]), 
-            1.0 if 'https' in url_lower else 0.0, 1.0 if 'www' in url_lower else 0.0,
-            1.0 if '.com' in url_lower else 0.0, 1.0 if '.org' in url_lower else 0.0,
-            1.0 if '.edu' in url_lower else 0.0, 1.0 if '.gov' in url_lower else 0.0,
-            len([c for c in url_lower if c.isalpha()]), 
-            len([c for c in url_lower if c.isdigit()]),
-            len([c for c in url_lower if not c.isalnum()])
-        ] + [0.0] * 30)  # Pad to 50
+        h, alpha, digit, nonalnum = _char_class_counts(url_lower)
+        markers = set(_URL_MARKER_RE.findall(url_lower))
+        out[0:20] = (
+            len(url), h[47] + 1, h[46] + 1,            # '/'- and '.'-separated parts
+            h[47], h[63], h[38],                        # '/', '?', '&'
+            h[61], h[45], h[95],                        # '=', '-', '_'
+            h[37], url_lower.find('?') if h[63] else len(url_lower),  # '%', length before '?'
+            1.0 if 'https' in markers else 0.0, 1.0 if 'www' in markers else 0.0,
+            1.0 if '.com' in markers else 0.0, 1.0 if '.org' in markers else 0.0,
+            1.0 if '.edu' in markers else 0.0, 1.0 if '.gov' in markers else 0.0,
+            alpha, digit, nonalnum
+        )
+        out[20:50] = 0.0  # Pad to 50
         
         # URL pattern features (100 features) - no hardcoded keywords
         # Simple URL complexity metrics instead
-        features.extend([
-            url_lower.count('youtube'), url_lower.count('reddit'), url_lower.count('github'),
-            url_lower.count('stackoverflow'), url_lower.count('wikipedia'), url_lower.count('docs'),
-            url_lower.count('learn'), url_lower.count('tutorial'), url_lower.count('course'),
-            url_lower.count('video'), url_lower.count('watch'), url_lower.count('search'),
-            1.0 if any(term in url_lower for term in ['api', 'doc', 'guide']) else 0.0,
-            1.0 if any(term in url_lower for term in ['game', 'play', 'fun']) else 0.0,
-            url_lower.count('/')  # Path depth indicator
-        ] + [0.0] * 85)  # Pad to 100
+        term_counts = _term_group_counts(_URL_TERM_AUTOMATON, _URL_TERM_GROUPS, url_lower, distinct=False)
+        out[50:62] = term_counts[:12]                   # youtube ... search occurrence counts
+        out[62] = 1.0 if term_counts[12] else 0.0       # api/doc/guide
+        out[63] = 1.0 if term_counts[13] else 0.0       # game/play/fun
+        out[64] = h[47]  # Path depth indicator
+        out[65:150] = 0.0  # Pad to 100
         
         # Character n-grams as hash features (234 features)
         url_clean = re.sub(r'[^a-zA-Z0-9]', ' ', url_lower)
         words = url_clean.split()
-        for i in range(234):
-            hash_val = hash(f"url_{i}_{' '.join(words[:5])}")  # Use first 5 words
-            features.append(float((hash_val % 1000) / 1000.0))  # Normalize to 0-1
+        _hash_features(b'url', words[:5], out[150:384])  # Use first 5 words
             
-        return np.array(features[:384], dtype=np.float32)
+        return out
     
-    def _extract_mission_text_features(self, mission: str) -> np.ndarray:
-        """Extract 384-dimensional text features from mission without external models"""
-        features = []
+    def _extract_mission_text_features(self, mission: str, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Extract 384-dimensional text features from mission without external models (into out if given)"""
+        if out is None:
+            out = np.empty(384, dtype=np.float32)
         mission_lower = mission.lower()
         
         # Basic text characteristics (50 features)
         words = mission_lower.split()
-        features.extend([
+        h, alpha, digit, nonalnum = _char_class_counts(mission_lower)
+        avg_word_len, max_word_len, _ = _word_length_stats(words)
+        out[0:15] = (
             len(mission), len(words), len(set(words)),
-            mission_lower.count(' '), mission_lower.count('.'), mission_lower.count(','),
-            mission_lower.count('!'), mission_lower.count('?'), mission_lower.count(';'),
-            mission_lower.count(':'), len([c for c in mission_lower if c.isalpha()]),
-            len([c for c in mission_lower if c.isdigit()]),
-            len([c for c in mission_lower if not c.isalnum()]),
-            sum(len(word) for word in words) / max(len(words), 1),  # Avg word length
-            max(len(word) for word in words) if words else 0,  # Max word length
-        ] + [0.0] * 35)  # Pad to 50
+            h[32], h[46], h[44],                        # ' ', '.', ','
+            h[33], h[63], h[59],                        # '!', '?', ';'
+            h[58], alpha, digit, nonalnum,              # ':'
+            avg_word_len,  # Avg word length
+            max_word_len,  # Max word length
+        )
+        out[15:50] = 0.0  # Pad to 50
         
         # Mission type indicators (100 features) - no hardcoded categorization
         # Simple mission pattern detection
-        learning_indicators = sum(1 for term in ['learn', 'study', 'understand', 'master', 'tutorial'] if term in mission_lower)
-        work_indicators = sum(1 for term in ['work', 'job', 'project', 'task', 'complete'] if term in mission_lower)
-        creative_indicators = sum(1 for term in ['create', 'build', 'develop', 'design', 'make'] if term in mission_lower)
-        research_indicators = sum(1 for term in ['research', 'find', 'information', 'data', 'explore'] if term in mission_lower)
-        skill_indicators = sum(1 for term in ['skill', 'practice', 'improve', 'training', 'course'] if term in mission_lower)
-        
-        features.extend([
-            learning_indicators, work_indicators, creative_indicators,
-            research_indicators, skill_indicators,
-            len(mission_lower.split()),  # Mission complexity
-            mission_lower.count('?'),  # Questions in mission
-            mission_lower.count('.'),  # Sentences in mission
-        ] + [0.0] * 92)  # Pad to 100
+        # learning, work, creative, research and skill indicators
+        indicators = _term_group_counts(_MISSION_TERM_AUTOMATON, _MISSION_TERM_GROUPS, mission_lower, distinct=True)
+        
+        out[50:55] = indicators
+        out[55] = len(words)  # Mission complexity
+        out[56] = h[63]  # Questions in mission
+        out[57] = h[46]  # Sentences in mission
+        out[58:150] = 0.0  # Pad to 100
         
         # Word-based hash features (234 features)
-        for i in range(234):
-            if i < len(words):
-                hash_val = hash(f"mission_{i}_{words[i]}")
-            else:
-                hash_val = hash(f"mission_{i}_empty")
-            features.append(float((hash_val % 1000) / 1000.0))  # Normalize to 0-1
+        _hash_features(b'mission', words[:234], out[150:384])
             
-        return np.array(features[:384], dtype=np.float32)
+        return out
     
-    def _extract_content_text_features(self, content_text: str) -> np.ndarray:
-        """Extract 384-dimensional text features from content without external models"""
-        features = []
+    def _extract_content_text_features(self, content_text: str, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Extract 384-dimensional text features from content without external models (into out if given)"""
+        if out is None:
+            out = np.empty(384, dtype=np.float32)
         content_lower = content_text.lower()
         
-        # Basic content characteristics (50 features)
-        sentences = content_lower.split('.')
+        # Basic content characteristics (51 features: this block has always been one wider)
         words = content_lower.split()
-        features.extend([
-            len(content_text), len(words), len(set(words)), len(sentences),
-            content_lower.count(' '), content_lower.count('.'), content_lower.count(','),
-            content_lower.count('!'), content_lower.count('?'), content_lower.count(':'),
-            content_lower.count(';'), content_lower.count('"'), content_lower.count("'"),
-            len([c for c in content_lower if c.isalpha()]),
-            len([c for c in content_lower if c.isdigit()]),
-            sum(len(word) for word in words) / max(len(words), 1),  # Avg word length
-            max(len(word) for word in words) if words else 0,  # Max word length
-            len([word for word in words if len(word) > 10]),  # Long words
+        h, alpha, digit, _ = _char_class_counts(content_lower)
+        num_sentences = int(h[46]) + 1  # len(content_lower.split('.'))
+        avg_word_len, max_word_len, long_words = _word_length_stats(words)
+        out[0:20] = (
+            len(content_text), len(words), len(set(words)), num_sentences,
+            h[32], h[46], h[44],                        # ' ', '.', ','
+            h[33], h[63], h[58],                        # '!', '?', ':'
+            h[59], h[34], h[39],                        # ';', '"', "'"
+            alpha, digit,
+            avg_word_len,  # Avg word length
+            max_word_len,  # Max word length
+            long_words,  # Long words
             content_lower.count('http'), content_lower.count('www'),
-        ] + [0.0] * 31)  # Pad to 50
+        )
+        out[20:51] = 0.0  # Pad to 51
         
         # Content quality and type indicators (100 features)
-        title_indicators = sum(1 for term in ['title', 'heading', 'header'] if term in content_lower)
-        description_indicators = sum(1 for term in ['description', 'summary', 'about'] if term in content_lower)
-        tutorial_indicators = sum(1 for term in ['tutorial', 'guide', 'how to', 'step'] if term in content_lower)
-        documentation_indicators = sum(1 for term in ['documentation', 'docs', 'api', 'reference'] if term in content_lower)
-        learning_indicators = sum(1 for term in ['learn', 'course', 'lesson', 'education'] if term in content_lower)
+        # title, description, tutorial, documentation and learning indicators (+ code terms)
+        indicators = _term_group_counts(_CONTENT_TERM_AUTOMATON, _CONTENT_TERM_GROUPS, content_lower, distinct=True)
         
         # Content structure indicators
-        has_lists = 1.0 if content_lower.count('•') > 0 or content_lower.count('-') > 3 else 0.0
-        has_code = 1.0 if content_lower.count('code') > 0 or content_lower.count('function') > 0 else 0.0
-        question_density = content_lower.count('?') / max(len(words), 1)
-        
-        features.extend([
-            title_indicators, description_indicators, tutorial_indicators,
-            documentation_indicators, learning_indicators,
-            has_lists, has_code, question_density,
-            len(sentences),  # Content structure complexity
-            max(len(word) for word in words) if words else 0  # Longest word (technical terms)
-        ] + [0.0] * 90)  # Pad to 100
-        
-        # Content-based hash features (234 features)
+        has_lists = 1.0 if '•' in content_lower or h[45] > 3 else 0.0
+        has_code = 1.0 if indicators[5] else 0.0
+        question_density = h[63] / max(len(words), 1)
+        
+        out[51:56] = indicators[:5]
+        out[56:59] = (has_lists, has_code, question_density)
+        out[59] = num_sentences  # Content structure complexity
+        out[60] = max_word_len  # Longest word (technical terms)
+        out[61:151] = 0.0  # Pad to 100
+        
+        # Content-based hash features (233 features, after the wider basic block)
         content_words = words[:20]  # Use first 20 words for consistency
-        for i in range(234):
-            if i < len(content_words):
-                hash_val = hash(f"content_{i}_{content_words[i]}")
-            else:
-                hash_val = hash(f"content_{i}_empty")
-            features.append(float((hash_val % 1000) / 1000.0))  # Normalize to 0-1
+        _hash_features(b'content', content_words, out[151:384])
             
-        return np.array(features[:384], dtype=np.float32)
+        return out
     
     def _extract_domain(self, url: str) -> str:
         """Extract domain from URL"""
@@ -292,11 +430,12 @@ class URLFeatureExtractor:
                 url = url.split("://", 1)[1]
             return f"Website: {url.replace('/', ' ').replace('-', ' ').replace('_', ' ')}"
     
-    def _extract_dynamic_url_features(self, metadata: dict) -> np.ndarray:
+    def _extract_dynamic_url_features(self, metadata: dict, url_lower: Optional[str] = None,
+                                      out: Optional[np.ndarray] = None) -> np.ndarray:
         """Extract URL-based features without hardcoded platforms"""
         features = []
         
-        url = metadata.get("url", "").lower()
+        url = metadata.get("url", "").lower() if url_lower is None else url_lower
         domain = metadata.get("domain", "").lower()
         path = metadata.get("path", "").lower()
         
@@ -324,9 +463,60 @@ class URLFeatureExtractor:
         features.append(url.count("&"))  # Number of parameters
         features.append(1.0 if "https" in url else 0.0)  # HTTPS indicator
         
-        return np.array(features, dtype=np.float32)
+        if out is None:
+            return np.array(features, dtype=np.float32)
+        out[:] = features
+        return out
+    
+    def _extract_dynamic_url_features_batch(self, metadatas: List[dict],
+                                            url_lowers: Optional[List[str]] = None) -> np.ndarray:
+        """_extract_dynamic_url_features for many metadata dicts at once, as an (N, 15) matrix.
+        
+        URL, domain and path strings are gathered into one array each so every
+        check runs over the whole batch in a single numpy.char call.
+        """
+        if url_lowers is None:
+            url_lowers = [metadata.get("url", "").lower() for metadata in metadatas]
+        urls = np.array(url_lowers, dtype=np.str_)
+        domains = np.array([metadata.get("domain", "").lower() for metadata in metadatas], dtype=np.str_)
+        paths = np.array([metadata.get("path", "").lower() for metadata in metadatas], dtype=np.str_)
+        query_params = [metadata.get("query_params", {}) for metadata in metadatas]
+        
+        def contains(strings, *terms):
+            found = np.char.find(strings, terms[0]) >= 0
+            for term in terms[1:]:
+                found |= np.char.find(strings, term) >= 0
+            return found
+        
+        features = np.empty((len(metadatas), 15), dtype=np.float32)
+        
+        # Domain characteristics (dynamic)
+        features[:, 0] = np.char.count(domains, ".") + 1                 # Domain complexity
+        features[:, 1] = np.char.endswith(domains, ".edu")               # Educational domain
+        features[:, 2] = np.char.endswith(domains, ".org")               # Organization domain
+        features[:, 3] = np.char.endswith(domains, ".gov")               # Government domain
+        features[:, 4] = contains(domains, "docs", "documentation")      # Documentation site
+        
+        # Path characteristics
+        features[:, 5] = np.char.count(paths, "/") + 1                   # Path depth
+        features[:, 6] = contains(paths, "/watch", "/video")             # Video content
+        features[:, 7] = contains(paths, "/article", "/post", "/blog")   # Article content
+        features[:, 8] = contains(paths, "/search", "/results")          # Search results
+        features[:, 9] = contains(paths, "/user", "/profile")            # User profiles
+        
+        # Query parameters
+        features[:, 10] = [len(params) for params in query_params]                    # Number of query parameters
+        features[:, 11] = [("q" in params or "search" in params) for params in query_params]  # Search query
+        
+        # URL length and complexity
+        features[:, 12] = np.char.str_len(urls)                          # Total URL length
+        features[:, 13] = np.char.count(urls, "&")                       # Number of parameters
+        features[:, 14] = contains(urls, "https")                        # HTTPS indicator
+        
+        return features
     
-    def _extract_content_features(self, metadata: dict, mission: str = "") -> np.ndarray:
+    def _extract_content_features(self, metadata: dict, mission: str = "",
+                                  out: Optional[np.ndarray] = None) -> np.ndarray:
         """Extract enhanced content-based features from metadata"""
         features = []
         
@@ -359,7 +549,6 @@ class URLFeatureExtractor:
             features.append(1.0 if educational_score > 0 else 0.0)  # Pure educational or unknown
         
         # Mission alignment indicators
-        mission_lower = mission.lower() if mission else ""
         youtube_title_lower = metadata.get("youtube_title", "").lower()
         youtube_desc_lower = metadata.get("youtube_description", "").lower()
         
@@ -375,10 +564,79 @@ class URLFeatureExtractor:
         features.append(1.0 if metadata.get("has_video", False) else 0.0)  # Has video
         features.append(1.0 if metadata.get("has_forms", False) else 0.0)  # Has forms
         
-        return np.array(features, dtype=np.float32)
+        if out is None:
+            return np.array(features, dtype=np.float32)
+        out[:] = features
+        return out
+    
+    def _extract_content_features_batch(self, metadatas: List[dict]) -> np.ndarray:
+        """_extract_content_features for many metadata dicts at once, as an (N, 15) matrix.
+        
+        The numeric fields are gathered into one array in a single pass, so the
+        normalisation and ratio arithmetic runs over the whole batch.
+        """
+        features = np.empty((len(metadatas), 15), dtype=np.float32)
+        if not metadatas:
+            return features
+        numeric = np.array([(metadata.get("content_length", 0),
+                             metadata.get("educational_indicators", 0),
+                             metadata.get("entertainment_indicators", 0),
+                             metadata.get("content_quality_score", 0.0)) for metadata in metadatas],
+                           dtype=np.float64)
+        content_length, educational_score, entertainment_score, quality_score = numeric.T
+        youtube_titles = np.array([metadata.get("youtube_title", "").lower() for metadata in metadatas], dtype=np.str_)
+        youtube_descs = np.array([metadata.get("youtube_description", "").lower() for metadata in metadatas], dtype=np.str_)
+        
+        # Enhanced content quality indicators
+        features[:, 0] = [bool(metadata.get("title", "")) for metadata in metadatas]             # Has title
+        features[:, 1] = [bool(metadata.get("meta_description", "")) for metadata in metadatas]  # Has description
+        features[:, 2] = [len(metadata.get("content_keywords", [])) for metadata in metadatas]   # Number of keywords
+        features[:, 3] = content_length / 10000.0                                                # Content length (normalized)
+        
+        # YouTube-specific features
+        features[:, 4] = np.char.str_len(youtube_titles) > 0                                     # Has YouTube title
+        features[:, 5] = np.char.str_len(youtube_descs) > 0                                      # Has YouTube description
+        features[:, 6] = [bool(metadata.get("youtube_channel", "")) for metadata in metadatas]   # Has channel info
+        
+        # Educational vs Entertainment indicators, content quality
+        features[:, 7] = np.minimum(educational_score / 10.0, 1.0)
+        features[:, 8] = np.minimum(entertainment_score / 10.0, 1.0)
+        features[:, 9] = quality_score
+        
+        # Educational vs entertainment ratio, capped at 5:1 (pure educational or unknown without entertainment)
+        has_entertainment = entertainment_score > 0
+        ratio = np.divide(educational_score, entertainment_score,
+                          out=np.zeros_like(educational_score), where=has_entertainment)
+        features[:, 10] = np.where(has_entertainment, np.minimum(ratio, 5.0) / 5.0, educational_score > 0)
+        
+        # Mission keyword matching
+        mission_keywords = ['logistic regression', 'machine learning', 'python', 'tutorial', 'algorithm']
+        title_mission_match = sum((np.char.find(youtube_titles, keyword) >= 0).astype(np.float64) for keyword in mission_keywords)
+        desc_mission_match = sum((np.char.find(youtube_descs, keyword) >= 0).astype(np.float64) for keyword in mission_keywords)
+        features[:, 11] = np.minimum(title_mission_match / 3.0, 1.0)                            # Title mission alignment
+        features[:, 12] = np.minimum(desc_mission_match / 5.0, 1.0)                             # Description mission alignment
+        
+        # Media and interactive elements
+        features[:, 13] = [bool(metadata.get("has_video", False)) for metadata in metadatas]     # Has video
+        features[:, 14] = [bool(metadata.get("has_forms", False)) for metadata in metadatas]     # Has forms
+        
+        return features
     
     def _extract_time_features(self) -> np.ndarray:
-        """Extract time-based features"""
+        """Extract time-based features (recomputed at most once a second)"""
+        now_t = time.monotonic()
+        cached_t, cached = URLFeatureExtractor._time_cache
+        if cached is not None and now_t - cached_t < 1.0:
+            return cached
+        
+        with URLFeatureExtractor._time_cache_lock:
+            features = self._compute_time_features()
+            features.setflags(write=False)
+            URLFeatureExtractor._time_cache = (now_t, features)
+        return features
+    
+    def _compute_time_features(self) -> np.ndarray:
+        """Compute time-based features from the current local time"""
         now = datetime.now()
         
         # Hour of day (0-23) normalized
@@ -396,6 +654,56 @@ class URLFeatureExtractor:
         return np.array([hour_norm, day_of_week, is_work_hours, is_weekend], dtype=np.float32)
 
 
+# Per-process extractor for extract_features_parallel workers
+_worker_feature_extractor = None
+
+def _init_feature_worker():
+    global _worker_feature_extractor
+    _worker_feature_extractor = URLFeatureExtractor()
+
+def _extract_features_chunk(shm_name: str, total_rows: int, start: int, metadatas: List[dict], missions: List[str]):
+    """Worker task: write rows [start, start + len(metadatas)) of the shared feature matrix"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        features = np.ndarray((total_rows, FEATURE_SIZE), dtype=np.float32, buffer=shm.buf)
+        _worker_feature_extractor.extract_features_batch(metadatas, missions, out=features[start:start + len(metadatas)])
+        del features  # release the buffer export before closing
+    finally:
+        shm.close()
+
+def extract_features_parallel(metadatas: List[dict], missions: List[str],
+                              max_workers: Optional[int] = None, chunk_size: int = 2000) -> np.ndarray:
+    """extract_features_batch spread over worker processes, for large training sets.
+    
+    Workers write their chunks straight into one shared-memory (N, FEATURE_SIZE)
+    matrix, so only the metadata is pickled. Feature hashing is process
+    independent, so the result matches a single-process extraction. Small
+    inputs (or a single worker) are extracted in-process.
+    """
+    total_rows = len(metadatas)
+    max_workers = max_workers or min(4, os.cpu_count() or 1)
+    if max_workers < 2 or total_rows < 2 * chunk_size:
+        return URLFeatureExtractor().extract_features_batch(metadatas, missions)
+    
+    shm = shared_memory.SharedMemory(create=True, size=total_rows * FEATURE_SIZE * np.dtype(np.float32).itemsize)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_feature_worker) as pool:
+            futures = [
+                pool.submit(_extract_features_chunk, shm.name, total_rows, start,
+                            metadatas[start:start + chunk_size], missions[start:start + chunk_size])
+                for start in range(0, total_rows, chunk_size)
+            ]
+            for future in futures:
+                future.result()
+        shared = np.ndarray((total_rows, FEATURE_SIZE), dtype=np.float32, buffer=shm.buf)
+        features = shared.copy()
+        del shared
+        return features
+    finally:
+        shm.close()
+        shm.unlink()
+
+
 class ProductivityClassifier(nn.Module):
     """Pretrained productivity classifier from pretraining"""
     def __init__(self, input_size):
@@ -408,20 +716,123 @@ class ProductivityClassifier(nn.Module):
         self.dropout = nn.Dropout(0.2)
         self.sigmoid = nn.Sigmoid()
 
-    def forward(self, x):
+    def logits(self, x):
+        """Raw pre-sigmoid scores; train on these with BCEWithLogitsLoss"""
+        # Dropout is the identity in eval mode, so skip its module calls entirely there
         x = self.relu(self.fc1(x))
-        x = self.dropout(x)
+        if self.training:
+            x = self.dropout(x)
         x = self.relu(self.fc2(x))
-        x = self.dropout(x)
+        if self.training:
+            x = self.dropout(x)
         x = self.relu(self.fc3(x))
-        x = self.sigmoid(self.fc4(x))
-        return x
+        return self.fc4(x)
+
+    def forward(self, x):
+        return self.sigmoid(self.logits(x))
+
+
+def stratified_split(labels: np.ndarray, test_size: float = 0.2, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """Shuffled train/test index arrays that keep each label's share in both splits"""
+    rng = np.random.default_rng(seed)
+    labels = np.asarray(labels)
+    train_parts, test_parts = [], []
+    for label in np.unique(labels):
+        idx = np.flatnonzero(labels == label)
+        rng.shuffle(idx)
+        n_test = int(round(len(idx) * test_size))
+        test_parts.append(idx[:n_test])
+        train_parts.append(idx[n_test:])
+    train_idx, test_idx = np.concatenate(train_parts), np.concatenate(test_parts)
+    rng.shuffle(train_idx)
+    rng.shuffle(test_idx)
+    return train_idx, test_idx
+
+
+def to_device(tensor: torch.Tensor, device: torch.device) -> torch.Tensor:
+    """Copy a CPU tensor to a training device (pinned, async on CUDA)"""
+    if device.type == 'cuda':
+        return tensor.pin_memory().to(device, non_blocking=True)
+    return tensor
+
+
+def evaluate(model: nn.Module, X: torch.Tensor, y: torch.Tensor, loss_function,
+             batch_size: int = 4096) -> Tuple[float, float]:
+    """Mean loss and accuracy of model.logits over mini-batches, accumulated on the device"""
+    with torch.inference_mode():
+        total_loss = torch.zeros((), device=X.device)
+        hits = torch.zeros((), dtype=torch.int64, device=X.device)
+        for i in range(0, len(X), batch_size):
+            batch_features, batch_labels = X[i:i+batch_size], y[i:i+batch_size]
+            logits = model.logits(batch_features)
+            total_loss += loss_function(logits, batch_labels) * len(batch_features)
+            # logit > 0 is probability > 0.5
+            hits += ((logits > 0.0) == batch_labels.bool()).sum()
+    return total_loss.item() / len(X), hits.item() / len(X)
+
+
+def compile_training_forward(model: nn.Module, device: torch.device):
+    """model.logits for the training loop, compiled on CUDA.
+    
+    Compiling fuses the MLP's pointwise ops (bias, ReLU, dropout) into fewer
+    kernels; the tail batch gets its own graph. State dicts still come from model.
+    """
+    if device.type == 'cuda':
+        return torch.compile(model.logits, mode='reduce-overhead', fullgraph=True)
+    return model.logits
+
+
+def training_autocast(device: torch.device):
+    """Autocast context for a training forward pass: fp16 matmuls on CUDA, a no-op elsewhere"""
+    return torch.autocast(device_type=device.type, dtype=torch.float16, enabled=device.type == 'cuda')
+
+
+def grad_scaler(device: torch.device) -> torch.amp.GradScaler:
+    """Loss scaler matching training_autocast: keeps small fp16 gradients from underflowing on CUDA,
+    a pass-through elsewhere"""
+    return torch.amp.GradScaler('cuda', enabled=device.type == 'cuda')
+
+
+def snapshot_state_dict(model: nn.Module) -> dict:
+    """The model's weights copied to the CPU (a shallow state_dict copy would keep tracking training)"""
+    return {k: v.detach().cpu().clone() for k, v in model.state_dict().items()}
 
 
+def _compile_keyword_matcher(keywords: List[str]):
+    """Return a function telling whether any keyword occurs in a text (one pass over the text)"""
+    if not keywords:
+        return lambda text: False
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return lambda text: next(automaton.iter(text), None) is not None
+    pattern = re.compile('|'.join(map(re.escape, keywords)))
+    return lambda text: pattern.search(text) is not None
+
+def _is_up_to_date(path: str, source_path: str) -> bool:
+    """True if path exists and is at least as new as source_path"""
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source_path)
+
+def _quantize_onnx(onnx_path: str, int8_path: str):
+    """Write an INT8 dynamically quantized copy of an exported ONNX model"""
+    import onnx
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    model = onnx.load(onnx_path)
+    # The exporter's value_info trips the quantizer's shape inference; it re-infers shapes anyway
+    model.graph.ClearField('value_info')
+    stripped_path = os.path.splitext(int8_path)[0] + ".tmp.onnx"
+    onnx.save(model, stripped_path)
+    try:
+        quantize_dynamic(stripped_path, int8_path, weight_type=QuantType.QInt8)
+    finally:
+        os.remove(stripped_path)
+
 class DQNNetwork(nn.Module):
     """Deep Q-Network for URL filtering decisions"""
     
-    def __init__(self, input_size: int = 1187, hidden_size: int = 512):  # 384+384+384+15+16+4 = 1187
+    def __init__(self, input_size: int = FEATURE_SIZE, hidden_size: int = 512):  # 384+384+384+15+15+4 = 1186
         super(DQNNetwork, self).__init__()
         
         self.network = nn.Sequential(
@@ -443,6 +854,121 @@ class DQNNetwork(nn.Module):
         return self.network(x)
 
 
+# Substring rules of RLFilter._fast_url_decision, all matched in one pass over the URL
+_FAST_RULE_GROUPS = (
+    # YouTube Shorts and Reel APIs
+    ('/shorts', 'el=shortspage', 'reel_watch_sequence', 'reel_item_watch', 'youtubei/v1/reel'),
+    # Infrastructure/streaming (matched anywhere in the URL)
+    ('googlevideo.com', 'ggpht.com', 'ytimg.com', 'gstatic.com',
+     'googleusercontent.com', 'googleapis.com', 'google.com',
+     'youtube.com/api/stats', 'youtube.com/videoplayback',
+     'youtube.com/get_video_info', 'youtube.com/iframe_api',
+     'youtube.com/embed', 'youtube.com/player', 'youtube.com/s/player',
+     'youtube.com/feather', 'youtube.com/iframe', 'youtube.com/static',
+     'youtube.com/yt', 'youtube.com/accounts', 'youtube.com/channel',
+     'youtube.com/user', 'youtube.com/c', 'youtube.com/playlist',
+     'youtube.com/results', 'youtube.com/search'),
+    # Distraction URL patterns
+    ('instagram.com/reels', 'instagram.com/explore', 'x.com/home', 'x.com/explore',
+     'youtube.com/shorts', 'youtube.com/feed', 'youtube.com/trending'),
+    # YouTube Shorts (comprehensive)
+    ('shorts',),
+    # Social media patterns
+    ('/feed', '/home', '/timeline', '/stories', '/reels', '/shorts'),
+    # Educational YouTube keywords
+    ('tutorial', 'course', 'learn', 'education', 'how to', 'guide', 'lesson'),
+    # YouTube watch/player endpoints
+    ('/watch', 'youtubei/v1/player'),
+)
+(_FAST_SHORTS_API, _FAST_ALLOW, _FAST_BLOCK_PATTERN, _FAST_SHORTS,
+ _FAST_SOCIAL, _FAST_EDUCATIONAL, _FAST_WATCH) = range(len(_FAST_RULE_GROUPS))
+
+# Domain rules of RLFilter._fast_url_decision; subdomains match too (see _domain_in)
+_EDUCATIONAL_DOMAINS = frozenset({
+    'github.com', 'stackoverflow.com', 'wikipedia.org', 'docs.python.org',
+    'python.org', 'realpython.com', 'geeksforgeeks.org', 'tutorialspoint.com',
+    'w3schools.com', 'mdn.io', 'developer.mozilla.org', 'kaggle.com',
+    'coursera.org', 'edx.org', 'udemy.com', 'freecodecamp.org',
+    'leetcode.com', 'hackerrank.com', 'codewars.com', 'exercism.io',
+    'rust-lang.org', 'golang.org', 'nodejs.org', 'reactjs.org',
+    'vuejs.org', 'angular.io', 'djangoproject.com', 'flask.palletsprojects.com',
+    'fastapi.tiangolo.com', 'pytorch.org', 'tensorflow.org', 'scikit-learn.org',
+    'pandas.pydata.org', 'numpy.org', 'matplotlib.org', 'seaborn.pydata.org',
+    'plotly.com', 'jupyter.org', 'anaconda.com', 'conda.io'
+})
+_ALWAYS_BLOCK_DOMAINS = frozenset({
+    'facebook.com', 'snapchat.com', 'reddit.com', '9gag.com', 'imgur.com',
+    'buzzfeed.com', 'vice.com', 'vox.com', 'huffpost.com',
+    'dailymail.co.uk', 'thesun.co.uk', 'tmz.com', 'eonline.com',
+    'people.com', 'usmagazine.com', 'justjared.com', 'popsugar.com',
+    'refinery29.com', 'bustle.com', 'cosmopolitan.com', 'elle.com',
+    'vogue.com', 'glamour.com', 'seventeen.com', 'teenvogue.com',
+    'tumblr.com', 'deviantart.com', 'flickr.com',
+    '500px.com', 'behance.net', 'dribbble.com', 'artstation.com'
+})
+_SEARCH_ENGINE_DOMAINS = frozenset({'google.com', 'bing.com', 'duckduckgo.com', 'yahoo.com'})
+
+# One table for all three lists, so a host's parent domains are walked once per decision.
+# The lists are disjoint and none nests inside another, so the first hit is unambiguous.
+_DOMAIN_EDUCATIONAL, _DOMAIN_DISTRACTION, _DOMAIN_SEARCH = range(1, 4)
+_DOMAIN_CATEGORIES = {
+    **dict.fromkeys(_EDUCATIONAL_DOMAINS, _DOMAIN_EDUCATIONAL),
+    **dict.fromkeys(_ALWAYS_BLOCK_DOMAINS, _DOMAIN_DISTRACTION),
+    **dict.fromkeys(_SEARCH_ENGINE_DOMAINS, _DOMAIN_SEARCH),
+}
+
+def _domain_category(domain: str) -> int:
+    """_DOMAIN_* category of domain or its nearest listed parent domain, 0 if unlisted"""
+    while domain:
+        category = _DOMAIN_CATEGORIES.get(domain)
+        if category is not None:
+            return category
+        domain = domain.partition('.')[2]
+    return 0
+
+@lru_cache(maxsize=16384)
+def _extract_domain(url: str) -> str:
+    """Lower-cased host of url without a leading www. (memoized: URLs repeat while browsing)"""
+    _, sep, rest = url.partition("://")
+    domain = (rest if sep else url).partition("/")[0]
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain.lower()
+
+def _domain_in(domain: str, domains) -> bool:
+    """Whether domain or one of its parent domains is in domains (one probe per label)"""
+    while domain:
+        if domain in domains:
+            return True
+        domain = domain.partition('.')[2]
+    return False
+
+def _build_rule_automaton(groups):
+    """Aho-Corasick automaton mapping each term to the indices of every group containing it"""
+    if ahocorasick is None:
+        return None
+    owners = {}
+    for index, group in enumerate(groups):
+        for term in group:
+            owners.setdefault(term, set()).add(index)
+    automaton = ahocorasick.Automaton()
+    for term, indices in owners.items():
+        automaton.add_word(term, frozenset(indices))
+    automaton.make_automaton()
+    return automaton
+
+_FAST_RULE_AUTOMATON = _build_rule_automaton(_FAST_RULE_GROUPS)
+
+def _matched_rule_groups(text: str) -> set:
+    """Indices of the _FAST_RULE_GROUPS with at least one term occurring in text"""
+    if _FAST_RULE_AUTOMATON is None:
+        return {index for index, group in enumerate(_FAST_RULE_GROUPS) if any(term in text for term in group)}
+    matched = set()
+    for _, indices in _FAST_RULE_AUTOMATON.iter(text):
+        matched |= indices
+    return matched
+
+
 class RLFilter:
     """Reinforcement Learning URL Filter"""
     
@@ -450,24 +976,46 @@ class RLFilter:
         self.cache_db_path = cache_db_path
         self.pretrained_model_path = pretrained_model_path
         self.mission_text = None
+        self._mission_features = None  # mission text features, recomputed only in set_mission
+        self._mission_matcher = _compile_keyword_matcher([])
         self.feature_extractor = URLFeatureExtractor()
         self.enhanced_metadata_extractor = get_enhanced_metadata_extractor()
-        self._lock = threading.Lock()
+        self._lock = threading.Lock()  # mission state and stats
+        self._model_lock = threading.Lock()  # PyTorch inference (see _predict_probabilities)
         
         # Initialize device
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         
+        # Right-size CPU thread pools: single-URL inference on a small MLP gets slower and
+        # noisier when every logical core joins each GEMM. OMP_NUM_THREADS only takes
+        # effect if set before torch is imported, so set it in the launcher environment.
+        self.num_threads = int(os.environ.get("RL_FILTER_THREADS", "0")) or min(4, max(1, (os.cpu_count() or 2) // 2))
+        self._configure_threads()
+        
         # Initialize pretrained productivity classifier
-        # Feature size: 384 (URL) + 384 (mission) + 384 (content) + 15 (URL features) + 16 (enhanced content features) + 4 (time) = 1187
-        self.input_size = 1186
+        # Feature size: 384 (URL) + 384 (mission) + 384 (content) + 15 (URL features) + 15 (content features) + 4 (time) = 1186
+        self.input_size = FEATURE_SIZE
         self.productivity_model = ProductivityClassifier(self.input_size).to(self.device)
         
         # Decision threshold for allow/block (probability > threshold = allow)
         self.decision_threshold = 0.5
         
+        # INT8 dynamic quantization of the Linear layers for CPU inference.
+        # Only pays off on CPUs with fast int8 GEMM (e.g. AVX512-VNNI), so off by default
+        self.quantize_cpu_model = os.environ.get("RL_FILTER_QUANTIZE", "0") == "1"
+        
+        # ONNX Runtime session used for CPU inference when onnxruntime is installed
+        self.ort_session = None
+        # Callable used for PyTorch inference (the compiled model on CUDA)
+        self._model_forward = self.productivity_model
+        
         # Decision caching for performance
-        self.decision_cache = {}  # URL -> (decision, timestamp)
+        self.decision_cache = OrderedDict()  # URL -> (decision, timestamp), bounded LRU
         self.cache_ttl = 300  # 5 minutes cache TTL
+        self.cache_max_size = 65536
+        
+        # Domains blocked at runtime via add_blocked_domain (checked before the cache)
+        self.blocked_domains = set()
         
 
         
@@ -486,6 +1034,15 @@ class RLFilter:
         self._setup_logging()
         self._load_model()
 
+    def _configure_threads(self):
+        """Apply num_threads to PyTorch (ONNX Runtime sessions pick it up when created)"""
+        torch.set_num_threads(self.num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work has started
+            pass
+    
     def _build_mission_keywords(self) -> List[str]:
         """Extract simple mission keywords (no external NLP)."""
         if not self.mission_text:
@@ -519,11 +1076,7 @@ class RLFilter:
         """Check if any mission keyword appears in provided text."""
         if not text:
             return False
-        text_l = text.lower()
-        for kw in self._build_mission_keywords():
-            if kw in text_l:
-                return True
-        return False
+        return self._mission_matcher(text.lower())
 
     def _is_youtube_video_mission_aligned(self, url: str) -> bool:
         """Fetch basic metadata for a YouTube video and check mission alignment.
@@ -544,8 +1097,23 @@ class RLFilter:
             return True
     
     def _setup_database(self):
-        """Initialize database for caching and feedback"""
-        with sqlite3.connect(self.cache_db_path) as conn:
+        """Open the long-lived database connection and create the tables.
+        
+        Decisions are queued and written in batches by a background writer thread
+        (see _writer_loop), so the decision path never waits on a commit; WAL keeps
+        readers unblocked while a batch commits.
+        """
+        self._db_lock = threading.Lock()
+        self._write_q = queue.Queue(maxsize=10_000)
+        self.db_write_batch_size = 256  # rows per transaction
+        
+        self._conn = sqlite3.connect(self.cache_db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+        
+        with self._db_lock, self._conn as conn:
             # Decision cache
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS decisions (
@@ -560,7 +1128,12 @@ class RLFilter:
                     reward REAL DEFAULT 0.0
                 )
             """)
-            
+            # provide_feedback looks up the latest decision for a (url, mission)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_decisions_url_mission
+                ON decisions (url, mission, timestamp)
+            """)
+
             # Training data
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS training_data (
@@ -573,7 +1146,9 @@ class RLFilter:
                     timestamp REAL
                 )
             """)
-            conn.commit()
+        
+        threading.Thread(target=self._writer_loop, name="rl-filter-db-writer", daemon=True).start()
+        atexit.register(self._flush_db)
     
     def _setup_logging(self):
         """Setup logging"""
@@ -584,18 +1159,23 @@ class RLFilter:
     
     def _get_cached_decision(self, url: str) -> Optional[bool]:
         """Get cached decision if available and not expired"""
-        if url in self.decision_cache:
-            decision, timestamp = self.decision_cache[url]
-            if time.time() - timestamp < self.cache_ttl:
-                self.stats["cache_hits"] += 1
-                return decision
-            else:
-                del self.decision_cache[url]
-        return None
+        entry = self.decision_cache.get(url)
+        if entry is None:
+            return None
+        decision, timestamp = entry
+        if time.time() - timestamp >= self.cache_ttl:
+            self.decision_cache.pop(url, None)
+            return None
+        self.decision_cache.move_to_end(url)
+        self.stats["cache_hits"] += 1
+        return decision
     
     def _cache_decision(self, url: str, decision: bool):
-        """Cache decision with timestamp"""
+        """Cache decision with timestamp, evicting the least recently used entry when full"""
         self.decision_cache[url] = (decision, time.time())
+        self.decision_cache.move_to_end(url)
+        if len(self.decision_cache) > self.cache_max_size:
+            self.decision_cache.popitem(last=False)
     
     def clear_cache(self):
         """Clear decision cache"""
@@ -617,12 +1197,20 @@ class RLFilter:
         self.logger.info(f"Added educational domain: {domain}")
     
     def add_blocked_domain(self, domain: str):
-        """Add domain to blocked list"""
-        # This would be used to dynamically update the fast decision system
+        """Add domain (and its subdomains) to blocked list"""
+        domain = domain.lower()
+        if domain.startswith("www."):
+            domain = domain[4:]
+        self.blocked_domains.add(domain)
         self.logger.info(f"Added blocked domain: {domain}")
     
+    def _is_blocked_domain(self, domain: str) -> bool:
+        """Check domain and its parent domains against the blocked list"""
+        return _domain_in(domain, self.blocked_domains)
+    
     def _load_model(self):
         """Load pretrained productivity classifier"""
+        loaded = False
         try:
             pretrained_path = os.path.join(os.path.dirname(__file__), self.pretrained_model_path)
             if os.path.exists(pretrained_path):
@@ -630,12 +1218,110 @@ class RLFilter:
                 pretrained_state_dict = torch.load(pretrained_path, map_location=self.device)
                 self.productivity_model.load_state_dict(pretrained_state_dict)
                 self.productivity_model.eval()  # Set to evaluation mode
+                loaded = True
                 self.logger.info(f"Pretrained model loaded from {pretrained_path}")
             else:
                 self.logger.warning(f"Pretrained model not found at {pretrained_path}, using randomly initialized model")
         except Exception as e:
             self.logger.error(f"Error loading pretrained model: {e}")
             self.logger.warning("Using randomly initialized model")
+        
+        if self.device.type == 'cpu':
+            # Only export weights that actually loaded; a failed load keeps the random init
+            if ort is not None and loaded:
+                self._setup_onnx_session(pretrained_path)
+            if self.ort_session is None and self.quantize_cpu_model:
+                self._quantize_model()
+        
+        self._model_forward = self.productivity_model
+        if self.device.type == 'cuda':
+            self._compile_model()
+    
+    def _compile_model(self):
+        """torch.compile the classifier for GPU inference, keeping eager mode if compilation fails.
+        
+        Only used on CUDA: on CPU, compiling costs tens of seconds at startup and
+        single-row calls end up slower than eager (ONNX Runtime covers CPU instead).
+        """
+        try:
+            compiled = torch.compile(self.productivity_model, mode='reduce-overhead', dynamic=True)
+            # Compile now rather than on the first URL decision
+            with torch.inference_mode():
+                compiled(torch.zeros(2, self.input_size, device=self.device))
+            self._model_forward = compiled
+            self.logger.info("Compiled productivity model with torch.compile")
+        except Exception as e:
+            self.logger.warning(f"torch.compile unavailable, using eager model: {e}")
+    
+    def _export_onnx(self, onnx_path: str):
+        """Export the classifier (sigmoid output, dynamic batch) to ONNX"""
+        torch.onnx.export(
+            self.productivity_model.eval(),
+            (torch.zeros(2, self.input_size),),
+            onnx_path,
+            input_names=['input'],
+            output_names=['probability'],
+            dynamic_shapes=({0: torch.export.Dim("batch")},),
+            external_data=False,
+            verbose=False,
+        )
+    
+    def _setup_onnx_session(self, pretrained_path: str):
+        """Create an ONNX Runtime session, re-exporting when the .pth is newer than the .onnx.
+        
+        The exported graphs live in the user cache directory, named after the .pth plus a
+        hash of its full path so separate checkouts don't share them.
+        """
+        name = os.path.splitext(os.path.basename(pretrained_path))[0]
+        path_hash = hashlib.sha1(os.path.abspath(pretrained_path).encode()).hexdigest()[:8]
+        base_path = os.path.join(_user_cache_dir(), "onnx", f"{name}-{path_hash}")
+        onnx_path = base_path + ".onnx"
+        model_path = base_path + (".int8.onnx" if self.quantize_cpu_model else ".onnx")
+        optimized_path = os.path.splitext(model_path)[0] + ".opt.onnx"
+        try:
+            os.makedirs(os.path.dirname(base_path), exist_ok=True)
+            if not _is_up_to_date(onnx_path, pretrained_path):
+                self._export_onnx(onnx_path)
+            if self.quantize_cpu_model and not _is_up_to_date(model_path, onnx_path):
+                _quantize_onnx(onnx_path, model_path)
+            
+            # Reuse the graph ORT optimized last time instead of re-optimizing on every start
+            sess_options = ort.SessionOptions()
+            sess_options.intra_op_num_threads = self.num_threads
+            sess_options.inter_op_num_threads = 1
+            if _is_up_to_date(optimized_path, model_path):
+                sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+                model_path = optimized_path
+            else:
+                # EXTENDED rather than ALL: the extra layout passes only target convolutions and
+                # would make the cached graph specific to this CPU
+                sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+                sess_options.optimized_model_filepath = optimized_path
+            self.ort_session = ort.InferenceSession(model_path, sess_options, providers=['CPUExecutionProvider'])
+            self.logger.info(f"ONNX Runtime session ready: {model_path}")
+        except Exception as e:
+            self.ort_session = None
+            self.logger.warning(f"ONNX Runtime unavailable, using PyTorch model: {e}")
+    
+    def _predict_probabilities(self, features: np.ndarray) -> np.ndarray:
+        """Productivity probabilities for an (N, input_size) feature matrix"""
+        if self.ort_session is not None:
+            # InferenceSession.run is safe to call from several threads
+            return self.ort_session.run(None, {'input': features})[0][:, 0]
+        features_tensor = torch.from_numpy(features).to(self.device, non_blocking=True)
+        # Compiled CUDA graphs replay from shared static buffers, so PyTorch calls go one at a time
+        with self._model_lock, torch.inference_mode():
+            return self._model_forward(features_tensor)[:, 0].cpu().numpy()
+    
+    def _quantize_model(self):
+        """Swap the classifier's Linear layers for dynamically quantized INT8 ones"""
+        try:
+            self.productivity_model = torch.ao.quantization.quantize_dynamic(
+                self.productivity_model.eval(), {nn.Linear}, dtype=torch.qint8
+            )
+            self.logger.info(f"Quantized productivity model to INT8 ({torch.backends.quantized.engine} engine)")
+        except Exception as e:
+            self.logger.warning(f"INT8 quantization unavailable, keeping FP32 model: {e}")
     
     def _save_stats(self):
         """Save current statistics"""
@@ -650,23 +1336,36 @@ class RLFilter:
         """Set mission text"""
         with self._lock:
             self.mission_text = mission_text
+            self._mission_features = self.feature_extractor._extract_mission_text_features(mission_text)
+            self._mission_matcher = _compile_keyword_matcher(self._build_mission_keywords())
+            # Cached decisions are keyed by URL only and some depend on the mission
+            self.decision_cache.clear()
             self.logger.info(f"Mission set: {mission_text}")
     
     def is_url_allowed(self, url: str) -> bool:
         """Ultra-fast URL decision using dictionary lookups"""
-        self.logger.info(f"FAST METHOD CALLED: {url}")
-        url_lower = url.lower()
+        return self._decide_url(url)
+    
+    def _decide_url(self, url: str) -> bool:
+        """Blocked domains, then the decision cache, then the fast-path rules"""
+        # Runtime-blocked domains win over anything cached earlier
+        if self.blocked_domains and self._is_blocked_domain(self._extract_domain_fast(url)):
+            self.stats["total_decisions"] += 1
+            self.stats["fast_path_decisions"] += 1
+            return False
         
-        # Check cache first (fastest path)
+        # Check cache first (fastest path: no parsing, lower-casing or logging).
+        # Hits count as decisions so cache_hit_rate is a share of all decisions
         cached_decision = self._get_cached_decision(url)
         if cached_decision is not None:
+            self.stats["total_decisions"] += 1
             return cached_decision
         
-        # Extract domain for fast lookups
-        domain = self._extract_domain_fast(url)
+        self.logger.info("FAST METHOD CALLED: %s", url)
         
-        # Dictionary-based fast decisions
-        decision = self._fast_url_decision(url_lower, domain)
+        # Dictionary-based fast decisions; the path rules are case-insensitive, so
+        # only a cache miss pays for lower-casing the whole URL
+        decision = self._fast_url_decision(url.lower(), self._extract_domain_fast(url))
         
         # Cache the decision
         self._cache_decision(url, decision)
@@ -674,241 +1373,217 @@ class RLFilter:
     
     def _extract_domain_fast(self, url: str) -> str:
         """Fast domain extraction without regex"""
-        if "://" in url:
-            url = url.split("://", 1)[1]
-        domain = url.split("/")[0]
-        if domain.startswith("www."):
-            domain = domain[4:]
-        return domain.lower()
+        return _extract_domain(url)
     
     def _fast_url_decision(self, url_lower: str, domain: str) -> bool:
         """Ultra-fast decision using dictionary lookups"""
         # Count decision for RL stats
         self.stats["total_decisions"] += 1
 
+        # Every substring rule below is resolved by a single scan of the URL
+        matched = _matched_rule_groups(url_lower)
+        is_youtube = 'youtube.com' in domain
+        domain_category = _domain_category(domain)
+
         # PRIORITY BLOCK: YouTube Shorts and Reel APIs (block BEFORE any allow rules)
-        if 'youtube.com' in domain:
-            youtube_shorts_markers = [
-                '/shorts',               # Page path
-                'el=shortspage',         # Shorts context param in stats calls
-                'reel_watch_sequence',   # Shorts API
-                'reel_item_watch',       # Shorts API
-                'youtubei/v1/reel'       # Shorts API base
-            ]
-            if any(marker in url_lower for marker in youtube_shorts_markers):
-                self.logger.info(f"BLOCK: {url_lower} (YouTube shorts/reel)")
-                self.stats["fast_path_decisions"] += 1
-                return False
+        if is_youtube and _FAST_SHORTS_API in matched:
+            self.logger.info("BLOCK: %s (YouTube shorts/reel)", url_lower)
+            self.stats["fast_path_decisions"] += 1
+            return False
 
         # 1. ALWAYS ALLOW - Infrastructure/Streaming
-        always_allow = {
-            'googlevideo.com', 'ggpht.com', 'ytimg.com', 'gstatic.com',
-            'googleusercontent.com', 'googleapis.com', 'google.com',
-            'youtube.com/api/stats', 'youtube.com/videoplayback',
-            'youtube.com/get_video_info', 'youtube.com/iframe_api',
-            'youtube.com/embed', 'youtube.com/player', 'youtube.com/s/player',
-            'youtube.com/feather', 'youtube.com/iframe', 'youtube.com/static',
-            'youtube.com/yt', 'youtube.com/accounts', 'youtube.com/channel',
-            'youtube.com/user', 'youtube.com/c', 'youtube.com/playlist',
-            'youtube.com/results', 'youtube.com/search'
-        }
-        
-        if domain in always_allow or any(allow_domain in url_lower for allow_domain in always_allow):
-            self.logger.info(f"ALLOW: {url_lower} (infrastructure)")
+        if _FAST_ALLOW in matched:
+            self.logger.info("ALLOW: %s (infrastructure)", url_lower)
             self.stats["fast_path_decisions"] += 1
             return True
         
         # 2. ALWAYS ALLOW - Educational/Productive
-        educational_domains = {
-            'github.com', 'stackoverflow.com', 'wikipedia.org', 'docs.python.org',
-            'python.org', 'realpython.com', 'geeksforgeeks.org', 'tutorialspoint.com',
-            'w3schools.com', 'mdn.io', 'developer.mozilla.org', 'kaggle.com',
-            'coursera.org', 'edx.org', 'udemy.com', 'freecodecamp.org',
-            'leetcode.com', 'hackerrank.com', 'codewars.com', 'exercism.io',
-            'rust-lang.org', 'golang.org', 'nodejs.org', 'reactjs.org',
-            'vuejs.org', 'angular.io', 'djangoproject.com', 'flask.palletsprojects.com',
-            'fastapi.tiangolo.com', 'pytorch.org', 'tensorflow.org', 'scikit-learn.org',
-            'pandas.pydata.org', 'numpy.org', 'matplotlib.org', 'seaborn.pydata.org',
-            'plotly.com', 'jupyter.org', 'anaconda.com', 'conda.io'
-        }
-        
-        if domain in educational_domains:
-            self.logger.info(f"ALLOW: {url_lower} (educational)")
+        if domain_category == _DOMAIN_EDUCATIONAL:
+            self.logger.info("ALLOW: %s (educational)", url_lower)
             self.stats["fast_path_decisions"] += 1
             return True
         
         # 3. ALWAYS BLOCK - Known Distractions (Domain-based)
-        always_block_domains = {
-            'facebook.com', 'snapchat.com', 'reddit.com', '9gag.com', 'imgur.com',
-            'buzzfeed.com', 'vice.com', 'vox.com', 'huffpost.com',
-            'dailymail.co.uk', 'thesun.co.uk', 'tmz.com', 'eonline.com',
-            'people.com', 'usmagazine.com', 'justjared.com', 'popsugar.com',
-            'refinery29.com', 'bustle.com', 'cosmopolitan.com', 'elle.com',
-            'vogue.com', 'glamour.com', 'seventeen.com', 'teenvogue.com',
-            'tumblr.com', 'deviantart.com', 'flickr.com',
-            '500px.com', 'behance.net', 'dribbble.com', 'artstation.com'
-        }
-        
-        if domain in always_block_domains:
-            self.logger.info(f"BLOCK: {url_lower} (distraction domain)")
+        if domain_category == _DOMAIN_DISTRACTION:
+            self.logger.info("BLOCK: %s (distraction domain)", url_lower)
             self.stats["fast_path_decisions"] += 1
             return False
         
         # 4. BLOCK - Specific URL Patterns (Path-based)
-        always_block_patterns = [
-            'instagram.com/reels/', 'instagram.com/explore/', 
-            'x.com/home', 'x.com/explore', 'youtube.com/shorts/',
-            'youtube.com/shorts', 'youtube.com/feed', 'youtube.com/trending',
-            'instagram.com/reels', 'instagram.com/explore',
-            'x.com/home', 'x.com/explore'
-        ]
-        
         # Debug: Log the URL being checked
-        if 'youtube.com' in url_lower and ('shorts' in url_lower or 'short' in url_lower):
-            self.logger.info(f"DEBUG: Checking YouTube URL: {url_lower}")
-            self.logger.info(f"DEBUG: Domain: {domain}")
-            self.logger.info(f"DEBUG: Contains 'shorts': {'shorts' in url_lower}")
-            self.logger.info(f"DEBUG: Contains 'short': {'short' in url_lower}")
-        
-        if any(pattern in url_lower for pattern in always_block_patterns):
-            self.logger.info(f"BLOCK: {url_lower} (distraction pattern)")
+        if self.logger.isEnabledFor(logging.DEBUG) and 'youtube.com' in url_lower and 'short' in url_lower:
+            self.logger.debug("Checking YouTube URL: %s (domain %s, contains 'shorts': %s)",
+                              url_lower, domain, 'shorts' in url_lower)
+        
+        if _FAST_BLOCK_PATTERN in matched:
+            self.logger.info("BLOCK: %s (distraction pattern)", url_lower)
             self.stats["fast_path_decisions"] += 1
             return False
         
         # 5. BLOCK - YouTube Shorts (comprehensive) - MUST BE BEFORE YOUTUBE ALLOWANCE
-        if 'youtube.com' in domain and ('shorts' in url_lower or '/shorts' in url_lower):
-            self.logger.info(f"BLOCK: {url_lower} (YouTube shorts)")
+        if is_youtube and _FAST_SHORTS in matched:
+            self.logger.info("BLOCK: %s (YouTube shorts)", url_lower)
             self.stats["fast_path_decisions"] += 1
             return False
         
         # 6. BLOCK - Social Media Patterns
-        social_patterns = ['/feed', '/home', '/timeline', '/stories', '/reels', '/shorts']
-        if any(pattern in url_lower for pattern in social_patterns):
-            self.logger.info(f"BLOCK: {url_lower} (social pattern)")
+        if _FAST_SOCIAL in matched:
+            self.logger.info("BLOCK: %s (social pattern)", url_lower)
             self.stats["fast_path_decisions"] += 1
             return False
         
         # 7. ALLOW - YouTube Educational Content (based on URL patterns)
-        if 'youtube.com' in domain:
-            educational_keywords = ['tutorial', 'course', 'learn', 'education', 'how to', 'guide', 'lesson']
-            if any(keyword in url_lower for keyword in educational_keywords):
-                self.logger.info(f"ALLOW: {url_lower} (educational YouTube)")
+        if is_youtube:
+            if _FAST_EDUCATIONAL in matched:
+                self.logger.info("ALLOW: %s (educational YouTube)", url_lower)
                 self.stats["fast_path_decisions"] += 1
                 return True
             
             # For standard watch/player endpoints, require mission alignment
-            if ('/watch' in url_lower) or ('youtubei/v1/player' in url_lower):
+            if _FAST_WATCH in matched:
                 is_aligned = self._is_youtube_video_mission_aligned(url_lower)
                 if not is_aligned:
-                    self.logger.info(f"BLOCK: {url_lower} (YouTube not mission-aligned)")
+                    self.logger.info("BLOCK: %s (YouTube not mission-aligned)", url_lower)
                     self.stats["fast_path_decisions"] += 1
                     return False
-                self.logger.info(f"ALLOW: {url_lower} (YouTube mission-aligned)")
+                self.logger.info("ALLOW: %s (YouTube mission-aligned)", url_lower)
                 self.stats["fast_path_decisions"] += 1
                 return True
             
             # Other YouTube pages (non-shorts): allow infra; policy fallback
-            self.logger.info(f"ALLOW: {url_lower} (YouTube other)")
+            self.logger.info("ALLOW: %s (YouTube other)", url_lower)
             self.stats["fast_path_decisions"] += 1
             return True
         
         # 8. ALLOW - Search Engines
-        search_engines = {'google.com', 'bing.com', 'duckduckgo.com', 'yahoo.com'}
-        if domain in search_engines:
-            self.logger.info(f"ALLOW: {url_lower} (search engine)")
+        if domain_category == _DOMAIN_SEARCH:
+            self.logger.info("ALLOW: %s (search engine)", url_lower)
             self.stats["fast_path_decisions"] += 1
             return True
         
         # 9. DEFAULT - Allow unknown domains (conservative approach)
-        self.logger.info(f"ALLOW: {url_lower} (default)")
+        self.logger.info("ALLOW: %s (default)", url_lower)
         self.stats["fast_path_decisions"] += 1
         return True
     
     def is_url_allowed_with_metadata(self, metadata: dict) -> bool:
         """Make allow/block decision using universal metadata"""
         self.logger.info(f"SLOW METHOD CALLED: {metadata.get('url', 'unknown')}")
-        if not self.mission_text:
-            return False
-        
-        url = metadata.get("url", "").lower()
-        domain = metadata.get("domain", "").lower()
+        return self.is_urls_allowed_with_metadata([metadata])[0]
+    
+    def is_urls_allowed_with_metadata(self, metadatas: List[dict]) -> List[bool]:
+        """Make allow/block decisions for a batch of metadata dicts.
         
+        Only the mission snapshot and the stats update take the filter lock, so
+        several proxy threads can extract features and run inference at once.
+        """
         with self._lock:
-            try:
-                # Extract features from universal metadata
-                features = self.feature_extractor.extract_features_from_metadata(metadata, self.mission_text)
-                
-                # Convert to tensor
-                features_tensor = torch.FloatTensor(features).unsqueeze(0).to(self.device)
-                
-                # Get productivity probability from pretrained model
-                with torch.no_grad():
-                    productivity_probability = self.productivity_model(features_tensor)
-                    confidence = productivity_probability.item()
-                
-                # Make decision based on threshold
-                decision = confidence > self.decision_threshold  # True=allow, False=block
-                action = int(decision)  # Convert to int for storage compatibility
-                
-                # Store decision for potential feedback
-                url = metadata.get("url", "unknown")
-                self._store_decision(url, features, action, confidence)
-                
-                self.stats["total_decisions"] += 1
-                
-                # Enhanced logging with key metadata
-                title = metadata.get("title", "")
-                domain = metadata.get("domain", "")
-                log_info = f"{url}"
-                if domain:
-                    log_info += f" [{domain}]"
-                if title:
-                    log_info += f" - {title[:50]}..."
+            mission_text, mission_features = self.mission_text, self._mission_features
+        if not mission_text or not metadatas:
+            return [False] * len(metadatas)
+        
+        try:
+            # Extract features for the whole batch, then one forward pass
+            features = self.feature_extractor.extract_features_batch(
+                metadatas, [mission_text] * len(metadatas),
+                mission_features={mission_text: mission_features},
+            )
+            confidences = self._predict_probabilities(features).tolist()
+            
+            # Make decisions based on threshold
+            decisions = [confidence > self.decision_threshold for confidence in confidences]  # True=allow, False=block
+            
+            # Store decisions for potential feedback
+            urls = [metadata.get("url", "unknown") for metadata in metadatas]
+            self._store_decisions(urls, features, decisions, confidences, mission_text)
+            
+            with self._lock:
+                self.stats["total_decisions"] += len(metadatas)
+            
+            # Enhanced logging with key metadata (skipped entirely when INFO is filtered out)
+            if self.logger.isEnabledFor(logging.INFO):
+                for metadata, url, decision, confidence in zip(metadatas, urls, decisions, confidences):
+                    title = metadata.get("title", "")
+                    domain = metadata.get("domain", "")
+                    log_info = f"{url}"
+                    if domain:
+                        log_info += f" [{domain}]"
+                    if title:
+                        log_info += f" - {title[:50]}..."
                     
-                self.logger.info(f"{'ALLOW' if decision else 'BLOCK'}: {log_info} (productivity: {confidence:.3f})")
-                
-                return decision
-                
-            except Exception as e:
-                self.logger.error(f"Error processing metadata for {metadata.get('url', 'unknown')}: {e}")
-                return False
+                    self.logger.info(f"{'ALLOW' if decision else 'BLOCK'}: {log_info} (productivity: {confidence:.3f})")
+            
+            return decisions
+            
+        except Exception as e:
+            self.logger.error(f"Error processing metadata for {[m.get('url', 'unknown') for m in metadatas]}: {e}")
+            return [False] * len(metadatas)
     
-    def _store_decision(self, url: str, features: np.ndarray, action: int, confidence: float):
-        """Store decision for potential user feedback"""
-        with sqlite3.connect(self.cache_db_path) as conn:
-            conn.execute("""
-                INSERT INTO decisions (url, mission, features, action, confidence, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (url, self.mission_text, features.tobytes(), action, confidence, time.time()))
-            conn.commit()
+    def _store_decisions(self, urls: List[str], features: np.ndarray, decisions: List[bool], confidences: List[float],
+                         mission_text: str):
+        """Store decisions for potential user feedback"""
+        now = time.time()
+        for url, row, decision, confidence in zip(urls, features, decisions, confidences):
+            try:
+                # action as int for storage compatibility
+                self._write_q.put_nowait((url, mission_text, row.tobytes(), int(decision), confidence, now))
+            except queue.Full:
+                self.logger.warning(f"Decision write queue full, dropping decision for {url}")
+    
+    def _writer_loop(self):
+        """Background thread: commit queued decisions, one transaction per batch"""
+        while True:
+            rows = [self._write_q.get()]
+            while len(rows) < self.db_write_batch_size:
+                try:
+                    rows.append(self._write_q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._db_lock, self._conn as conn:
+                    conn.executemany("""
+                        INSERT INTO decisions (url, mission, features, action, confidence, timestamp)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, rows)
+            except sqlite3.Error as e:
+                self.logger.error(f"Error writing {len(rows)} decisions: {e}")
+            finally:
+                for _ in rows:
+                    self._write_q.task_done()
+    
+    def _flush_db(self):
+        """Wait until every queued decision has been written"""
+        self._write_q.join()
     
     def provide_feedback(self, url: str, is_correct: bool):
         """Provide feedback on a decision"""
         reward = 1.0 if is_correct else -1.0
         
-        with sqlite3.connect(self.cache_db_path) as conn:
-            # Update most recent decision for this URL
-            conn.execute("""
-                UPDATE decisions 
-                SET user_feedback = ?, reward = ?
-                WHERE url = ? AND mission = ?
-                ORDER BY timestamp DESC
-                LIMIT 1
-            """, (int(is_correct), reward, url, self.mission_text))
-            
-            # Get the decision data for training
+        # The decision being rated may still be buffered
+        self._flush_db()
+        
+        with self._db_lock, self._conn as conn:
+            # Most recent decision for this URL (an index search on url, mission, timestamp)
             result = conn.execute("""
-                SELECT features, action, reward
+                SELECT id, features, action
                 FROM decisions 
-                WHERE url = ? AND mission = ? AND user_feedback IS NOT NULL
+                WHERE url = ? AND mission = ?
                 ORDER BY timestamp DESC
                 LIMIT 1
             """, (url, self.mission_text)).fetchone()
             
             if result:
-                features = np.frombuffer(result[0], dtype=np.float32)
-                action = result[1]
-                reward = result[2]
+                # Record the feedback on that row by id; UPDATE ... ORDER BY/LIMIT needs
+                # SQLITE_ENABLE_UPDATE_DELETE_LIMIT, which default SQLite builds leave out
+                conn.execute("""
+                    UPDATE decisions 
+                    SET user_feedback = ?, reward = ?
+                    WHERE id = ?
+                """, (int(is_correct), reward, result[0]))
+                
+                # Decision data for training
+                features = np.frombuffer(result[1], dtype=np.float32)
+                action = result[2]
                 
                 # Update statistics
                 self.stats["user_feedback_count"] += 1
@@ -917,8 +1592,6 @@ class RLFilter:
                 
                 # Collect feedback stats periodically
                 self._collect_feedback_stats()
-                
-                conn.commit()
     
     def _collect_feedback_stats(self):
         """Collect feedback statistics for model evaluation"""
@@ -4,17 +4,143 @@ RL Proxy Filter - mitmproxy script using reinforcement learning
 Replaces the threshold-based AI filter with adaptive RL
 """
 
+import html
 import json
 import os
 import sys
 import time
 import logging
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 from mitmproxy import http, ctx
 import rl_filter
 import sqlite3
 
+# Static parts of the blocked page; only the URL, mission and stats in between vary per block
+_BLOCKED_PAGE_PREFIX = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Access Blocked - Focus Mode</title>
+    <meta charset="UTF-8">
+    <style>
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            margin: 0;
+            padding: 0;
+            min-height: 100vh;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+        }
+        .container {
+            background: white;
+            padding: 40px;
+            border-radius: 10px;
+            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
+            text-align: center;
+            max-width: 600px;
+            margin: 20px;
+        }
+        .icon {
+            font-size: 64px;
+            margin-bottom: 20px;
+        }
+        h1 {
+            color: #333;
+            margin-bottom: 10px;
+        }
+        .url {
+            background: #f5f5f5;
+            padding: 10px;
+            border-radius: 5px;
+            font-family: monospace;
+            word-break: break-all;
+            margin: 20px 0;
+        }
+        .mission {
+            background: #e8f4fd;
+            border-left: 4px solid #2196F3;
+            padding: 15px;
+            margin: 20px 0;
+            text-align: left;
+        }
+        .feedback {
+            background: #fff3cd;
+            border: 1px solid #ffeaa7;
+            border-radius: 5px;
+            padding: 20px;
+            margin: 20px 0;
+        }
+        .feedback-buttons {
+            margin-top: 15px;
+        }
+        .btn {
+            padding: 10px 20px;
+            margin: 0 10px;
+            border: none;
+            border-radius: 5px;
+            cursor: pointer;
+            font-size: 14px;
+            text-decoration: none;
+            display: inline-block;
+        }
+        .btn-correct {
+            background-color: #28a745;
+            color: white;
+        }
+        .btn-incorrect {
+            background-color: #dc3545;
+            color: white;
+        }
+        .stats {
+            margin-top: 30px;
+            padding: 15px;
+            background: #f9f9f9;
+            border-radius: 5px;
+            font-size: 14px;
+        }
+        .rl-stats {
+            background: #e1f5fe;
+            border-left: 4px solid #0288d1;
+            padding: 10px;
+            margin: 10px 0;
+            font-size: 12px;
+        }
+        .time {
+            color: #666;
+            font-size: 12px;
+        }
+    </style>
+    <script>
+        function provideFeedback(url, isCorrect) {
+            // TODO: Implement actual feedback submission to backend
+            // Currently only shows confirmation - feedback doesn't reach the AI system
+            // Would need HTTP endpoint or WebSocket to send to handle_feedback_request()
+            var message = isCorrect ? 
+                "Thank you! This helps improve the AI's accuracy." : 
+                "Thank you! The AI will learn from this mistake.";
+
+            document.getElementById('feedback-section').innerHTML = 
+                '<div style="background: #d4edda; color: #155724; padding: 10px; border-radius: 5px;">' + 
+                message + '<br><small>(Note: Feedback display only - backend integration pending)</small></div>';
+        }
+    </script>
+</head>
+<body>
+    <div class="container">
+        <div class="icon">🤖</div>
+        <h1>AI-Filtered Block</h1>
+        <p>This website has been blocked by the AI filter to help you stay focused on your mission.</p>
+
+        <div class="url">"""
+
+_BLOCKED_PAGE_SUFFIX = """    </div>
+</body>
+</html>"""
+
+
 class RLProxyFilter:
     """Proxy filter using reinforcement learning"""
     
@@ -31,6 +157,13 @@ class RLProxyFilter:
             "feedback_provided": 0
         }
         
+        # Blocked page template, encoded once
+        self._html_prefix_bytes = _BLOCKED_PAGE_PREFIX.encode('utf-8')
+        self._html_suffix_bytes = _BLOCKED_PAGE_SUFFIX.encode('utf-8')
+        self.stats_html_ttl = 1.0  # seconds between stats re-renders on the blocked page
+        self._stats_html = None
+        self._stats_html_expires = 0.0
+        
         # Load mission
         self.load_mission()
         
@@ -45,8 +178,10 @@ class RLProxyFilter:
     
     def _setup_feedback_system(self):
         """Setup feedback collection system"""
-        self.pending_feedback = {}  # Store recent decisions for feedback
+        self.pending_feedback = OrderedDict()  # Store recent decisions for feedback, oldest first
         self.feedback_timeout = 300  # 5 minutes to provide feedback
+        self.max_pending_feedback = 10000  # cap for bursts within the timeout; the oldest go first
+        self.cleanup_interval = 64  # requests between expired-feedback sweeps
     
     def load_mission(self):
         """Load mission from mission.json file"""
@@ -117,8 +252,9 @@ class RLProxyFilter:
                     {"Content-Type": "text/html; charset=utf-8"}
                 )
             
-            # Clean up old pending feedback
-            self._cleanup_pending_feedback()
+            # Clean up old pending feedback, every cleanup_interval requests
+            if self.stats["requests_processed"] % self.cleanup_interval == 0:
+                self._cleanup_pending_feedback()
             
         except Exception as e:
             self.logger.error(f"Error processing request for {flow.request.pretty_url}: {e}")
@@ -137,189 +273,82 @@ class RLProxyFilter:
             "timestamp": current_time,
             "decision_time": decision_time
         }
+        # Keep entries in timestamp order so cleanup only looks at the oldest ones
+        self.pending_feedback.move_to_end(url_key)
+        if len(self.pending_feedback) > self.max_pending_feedback:
+            self.pending_feedback.popitem(last=False)
     
     def _cleanup_pending_feedback(self):
-        """Remove old pending feedback entries"""
+        """Remove old pending feedback entries (from the oldest end, stopping at the first fresh one)"""
         current_time = time.time()
-        expired_keys = [
-            key for key, data in self.pending_feedback.items()
-            if current_time - data["timestamp"] > self.feedback_timeout
-        ]
-        
-        for key in expired_keys:
-            del self.pending_feedback[key]
+        pending = self.pending_feedback
+        while pending and current_time - next(iter(pending.values()))["timestamp"] > self.feedback_timeout:
+            pending.popitem(last=False)
     
-    def _create_blocked_response_with_feedback(self, url: str) -> str:
+    def _create_blocked_response_with_feedback(self, url: str) -> bytes:
         """Create HTML response for blocked requests with feedback option"""
+        # The URL goes into element text and, as a JS string literal, into onclick attributes
+        safe_url = html.escape(url)
+        js_url = html.escape(json.dumps(url))
+        mission_html, stats_html = self._blocked_page_stats()
+        middle = f"""{safe_url}</div>
+
+        <div class="mission">
+            <strong>Your Current Mission:</strong><br>
+            {mission_html}
+        </div>
+
+        <div id="feedback-section" class="feedback">
+            <strong>Help Improve the AI:</strong><br>
+            Was this decision correct?
+            <div class="feedback-buttons">
+                <button class="btn btn-correct" onclick="provideFeedback({js_url}, true)">
+                    ✓ Correct (should block)
+                </button>
+                <button class="btn btn-incorrect" onclick="provideFeedback({js_url}, false)">
+                    ✗ Wrong (should allow)
+                </button>
+            </div>
+        </div>
+
+{stats_html}
+        <div class="time">
+            Blocked at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        </div>
+"""
+        return self._html_prefix_bytes + middle.encode('utf-8') + self._html_suffix_bytes
+
+    def _blocked_page_stats(self):
+        """Return the escaped mission and rendered stats blocks, re-rendered at most once per TTL"""
+        now = time.time()
+        if now < self._stats_html_expires:
+            return self._stats_html
         
         # Get RL stats
         rl_stats = self.rl_filter.get_stats()
-        mission_text = rl_stats.get('mission', 'your current mission')
+        mission_text = rl_stats.get('mission') or 'your current mission'
         accuracy = rl_stats.get('accuracy', 0) * 100
-        
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Access Blocked - Focus Mode</title>
-            <meta charset="UTF-8">
-            <style>
-                body {{
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    margin: 0;
-                    padding: 0;
-                    min-height: 100vh;
-                    display: flex;
-                    align-items: center;
-                    justify-content: center;
-                }}
-                .container {{
-                    background: white;
-                    padding: 40px;
-                    border-radius: 10px;
-                    box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-                    text-align: center;
-                    max-width: 600px;
-                    margin: 20px;
-                }}
-                .icon {{
-                    font-size: 64px;
-                    margin-bottom: 20px;
-                }}
-                h1 {{
-                    color: #333;
-                    margin-bottom: 10px;
-                }}
-                .url {{
-                    background: #f5f5f5;
-                    padding: 10px;
-                    border-radius: 5px;
-                    font-family: monospace;
-                    word-break: break-all;
-                    margin: 20px 0;
-                }}
-                .mission {{
-                    background: #e8f4fd;
-                    border-left: 4px solid #2196F3;
-                    padding: 15px;
-                    margin: 20px 0;
-                    text-align: left;
-                }}
-                .feedback {{
-                    background: #fff3cd;
-                    border: 1px solid #ffeaa7;
-                    border-radius: 5px;
-                    padding: 20px;
-                    margin: 20px 0;
-                }}
-                .feedback-buttons {{
-                    margin-top: 15px;
-                }}
-                .btn {{
-                    padding: 10px 20px;
-                    margin: 0 10px;
-                    border: none;
-                    border-radius: 5px;
-                    cursor: pointer;
-                    font-size: 14px;
-                    text-decoration: none;
-                    display: inline-block;
-                }}
-                .btn-correct {{
-                    background-color: #28a745;
-                    color: white;
-                }}
-                .btn-incorrect {{
-                    background-color: #dc3545;
-                    color: white;
-                }}
-                .stats {{
-                    margin-top: 30px;
-                    padding: 15px;
-                    background: #f9f9f9;
-                    border-radius: 5px;
-                    font-size: 14px;
-                }}
-                .rl-stats {{
-                    background: #e1f5fe;
-                    border-left: 4px solid #0288d1;
-                    padding: 10px;
-                    margin: 10px 0;
-                    font-size: 12px;
-                }}
-                .time {{
-                    color: #666;
-                    font-size: 12px;
-                }}
-            </style>
-            <script>
-                function provideFeedback(url, isCorrect) {{
-                    // TODO: Implement actual feedback submission to backend
-                    // Currently only shows confirmation - feedback doesn't reach the AI system
-                    // Would need HTTP endpoint or WebSocket to send to handle_feedback_request()
-                    var message = isCorrect ? 
-                        "Thank you! This helps improve the AI's accuracy." : 
-                        "Thank you! The AI will learn from this mistake.";
-                    
-                    document.getElementById('feedback-section').innerHTML = 
-                        '<div style="background: #d4edda; color: #155724; padding: 10px; border-radius: 5px;">' + 
-                        message + '<br><small>(Note: Feedback display only - backend integration pending)</small></div>';
-                }}
-            </script>
-        </head>
-        <body>
-            <div class="container">
-                <div class="icon">🤖</div>
-                <h1>AI-Filtered Block</h1>
-                <p>This website has been blocked by the AI filter to help you stay focused on your mission.</p>
-                
-                <div class="url">{url}</div>
-                
-                <div class="mission">
-                    <strong>Your Current Mission:</strong><br>
-                    {mission_text}
-                </div>
-                
-                <div id="feedback-section" class="feedback">
-                    <strong>Help Improve the AI:</strong><br>
-                    Was this decision correct?
-                    <div class="feedback-buttons">
-                        <button class="btn btn-correct" onclick="provideFeedback('{url}', true)">
-                            ✓ Correct (should block)
-                        </button>
-                        <button class="btn btn-incorrect" onclick="provideFeedback('{url}', false)">
-                            ✗ Wrong (should allow)
-                        </button>
-                    </div>
-                </div>
-                
-                <div class="stats">
-                    <strong>Session Stats:</strong><br>
-                    Requests Processed: {self.stats["requests_processed"]}<br>
-                    Allowed: {self.stats["requests_allowed"]} | Blocked: {self.stats["requests_blocked"]}<br>
-                    Block Rate: {(self.stats["requests_blocked"]/max(1,self.stats["requests_processed"])*100):.1f}%<br>
-                    Feedback Provided: {self.stats["feedback_provided"]}
-                </div>
-                
-                <div class="rl-stats">
-                    <strong>AI Performance:</strong><br>
-                    Total Decisions: {rl_stats.get('total_decisions', 0)}<br>
-                    Learning Accuracy: {accuracy:.1f}%<br>
-                    User Feedback Count: {rl_stats.get('user_feedback_count', 0)}<br>
-                    Cache Hit Rate: {rl_stats.get('cache_hit_rate', 0)*100:.1f}%<br>
-                    Fast Path Rate: {rl_stats.get('fast_path_rate', 0)*100:.1f}%<br>
-                    Model Type: {rl_stats.get('model_type', 'unknown')}
-                </div>
-                
-                <div class="time">
-                    Blocked at {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        return html.strip()
+        stats_html = f"""        <div class="stats">
+            <strong>Session Stats:</strong><br>
+            Requests Processed: {self.stats["requests_processed"]}<br>
+            Allowed: {self.stats["requests_allowed"]} | Blocked: {self.stats["requests_blocked"]}<br>
+            Block Rate: {(self.stats["requests_blocked"]/max(1,self.stats["requests_processed"])*100):.1f}%<br>
+            Feedback Provided: {self.stats["feedback_provided"]}
+        </div>
+
+        <div class="rl-stats">
+            <strong>AI Performance:</strong><br>
+            Total Decisions: {rl_stats.get('total_decisions', 0)}<br>
+            Learning Accuracy: {accuracy:.1f}%<br>
+            User Feedback Count: {rl_stats.get('user_feedback_count', 0)}<br>
+            Cache Hit Rate: {rl_stats.get('cache_hit_rate', 0)*100:.1f}%<br>
+            Fast Path Rate: {rl_stats.get('fast_path_rate', 0)*100:.1f}%<br>
+            Model Type: {html.escape(str(rl_stats.get('model_type', 'unknown')))}
+        </div>
+"""
+        self._stats_html = (html.escape(mission_text), stats_html)
+        self._stats_html_expires = now + self.stats_html_ttl
+        return self._stats_html
     
     def provide_feedback_for_url(self, url: str, is_correct: bool):
         """Provide feedback for a specific URL decision"""
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Parser parity tests for the enhanced metadata extractor
+Pages are parsed with selectolax (Lexbor) when installed and BeautifulSoup otherwise;
+both must produce the same metadata.
+"""
+
+import pytest
+
+pytest.importorskip("selectolax")
+pytest.importorskip("bs4")
+
+try:
+    from . import enhanced_metadata_extractor as extractor_module
+except ImportError:
+    # Fallback for when running from inside RL/ (not as package)
+    import enhanced_metadata_extractor as extractor_module
+get_enhanced_metadata_extractor = extractor_module.get_enhanced_metadata_extractor
+
+GENERIC_PAGE = b"""<!DOCTYPE html>
+<html>
+<head>
+    <title>T</title>
+    <meta name="description" content="A page about logistic regression">
+    <meta name="keywords" content="python, machine learning , ">
+    <meta property="og:title" content="OG title">
+    <script>var x = "SCRIPTTEXT";</script>
+    <style>p { color: red }</style>
+</head>
+<body>
+    <noscript><p>Please enable <b>JavaScript</b></p><img src="pixel.gif"></noscript>
+    <template><p>TEMPLATETEXT</p></template>
+    <h1>Heading</h1>
+    <p>Hello <b>world</b></p>
+    <p>Second paragraph with <a href="https://example.org/x">a link</a> and <a href="/local">another</a></p>
+    <ul><li>one</li><li>two</li></ul>
+    <pre><code>print("hi")</code></pre>
+    <!-- a comment -->
+    <script type="application/ld+json">{"@type": "VideoObject"}</script>
+    <img src="a.png"><form></form>
+    tail text
+</body>
+</html>"""
+
+YOUTUBE_PAGE = b"""<!DOCTYPE html>
+<html>
+<head>
+    <title>Logistic Regression Tutorial - YouTube</title>
+    <meta name="description" content="Learn how logistic regression works in this machine learning tutorial">
+    <meta property="og:title" content="Logistic Regression Tutorial">
+    <meta property="og:site_name" content="YouTube">
+    <script>var ytInitialData = {"title": "SCRIPTTEXT"};</script>
+</head>
+<body>
+    <h1 class="title">Logistic Regression Tutorial</h1>
+    <link itemprop="name" content="StatQuest">
+    <div id="description">A full walk-through of the algorithm</div>
+</body>
+</html>"""
+
+
+def _parse_with(monkeypatch, use_lexbor: bool, url: str, page: bytes) -> dict:
+    """Run the extractor's page parsing with one HTML parser forced"""
+    if not use_lexbor:
+        monkeypatch.setattr(extractor_module, "LexborHTMLParser", None)
+    extractor = get_enhanced_metadata_extractor()
+    return extractor._parse_page(url, page, extractor._create_basic_metadata(url))
+
+
+def _page_words(monkeypatch, use_lexbor: bool, page: bytes) -> list:
+    """Words of the document text as the extractor walks it"""
+    if use_lexbor:
+        doc = extractor_module.LexborHTMLParser(page)
+    else:
+        monkeypatch.setattr(extractor_module, "LexborHTMLParser", None)
+        doc = extractor_module.BeautifulSoup(page, extractor_module.HTML_PARSER)
+    return "".join(extractor_module._iter_text(doc)).split()
+
+
+@pytest.mark.parametrize("url, page", [
+    ("https://example.com/article", GENERIC_PAGE),
+    ("https://www.youtube.com/watch?v=abc", YOUTUBE_PAGE),
+])
+def test_parsers_produce_same_metadata(monkeypatch, url, page):
+    lexbor_metadata = _parse_with(monkeypatch, True, url, page)
+    soup_metadata = _parse_with(monkeypatch, False, url, page)
+    # The parsers keep inter-element whitespace differently, so content_length
+    # (a raw character count) is compared through the words instead
+    lexbor_metadata.pop("content_length")
+    soup_metadata.pop("content_length")
+    assert lexbor_metadata == soup_metadata
+
+
+@pytest.mark.parametrize("page", [GENERIC_PAGE, YOUTUBE_PAGE])
+def test_parsers_walk_same_text(monkeypatch, page):
+    lexbor_words = _page_words(monkeypatch, True, page)
+    soup_words = _page_words(monkeypatch, False, page)
+    assert lexbor_words == soup_words
+
+
+@pytest.mark.parametrize("use_lexbor", [True, False])
+def test_extracted_text_skips_script_style_noscript_and_template(monkeypatch, use_lexbor):
+    metadata = _parse_with(monkeypatch, use_lexbor, "https://example.com/article", GENERIC_PAGE)
+    text = metadata["extracted_text"]
+    assert "Hello" in text and "tail text" in text
+    for hidden in ("SCRIPTTEXT", "color: red", "JavaScript", "TEMPLATETEXT", "VideoObject"):
+        assert hidden not in text
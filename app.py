@@ -469,7 +469,7 @@ Anchorite Team
         """Install required dependencies"""
         try:
             subprocess.check_call([sys.executable, "-m", "pip", "install", 
-                                 "mitmproxy", "torch", "numpy", "scikit-learn", 
+                                 "mitmproxy", "torch", "numpy", 
                                  "requests", "beautifulsoup4"], 
                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         except subprocess.CalledProcessError:
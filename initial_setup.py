@@ -14,8 +14,10 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import threading
+import secrets
 from datetime import datetime
 import logging
+from password_unlock import hash_master_password
 
 # Anchorite Email Configuration (Secure - sent from Anchorite, not user email)
 ANCHORITE_EMAIL = "anchorite.focus@gmail.com"
@@ -389,10 +391,12 @@ anchorite.focus@gmail.com"""
             
     def save_user_config(self):
         """Save user configuration to file"""
+        salt = secrets.token_hex(16)
         config = {
             "user_email": self.user_email,
             "trusted_contacts": self.trusted_contacts,
-            "master_password_hash": hash(self.master_password),  # Store hash for verification
+            "master_password_hash": hash_master_password(self.master_password, salt),  # Store hash for verification
+            "master_password_salt": salt,
             "setup_completed": True,
             "setup_date": datetime.now().isoformat(),
             "anchorite_email_used": True  # Indicates emails sent from Anchorite system
@@ -36,7 +36,7 @@ def main():
             print("📦 Installing dependencies...")
             subprocess.check_call([
                 sys.executable, "-m", "pip", "install", 
-                "mitmproxy", "torch", "numpy", "scikit-learn", 
+                "mitmproxy", "torch", "numpy", 
                 "requests", "beautifulsoup4"
             ])
             print("✅ Dependencies installed")
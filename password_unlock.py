@@ -8,8 +8,13 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import json
 import hashlib
+import hmac
 from datetime import datetime
 
+def hash_master_password(master_password: str, salt_hex: str) -> str:
+    """Salted PBKDF2 digest of the master password (stable across runs, unlike hash())"""
+    return hashlib.pbkdf2_hmac('sha256', master_password.encode('utf-8'), bytes.fromhex(salt_hex), 200000).hex()
+
 class PasswordUnlock:
     def __init__(self, parent=None):
         self.root = tk.Toplevel(parent) if parent else tk.Tk()
@@ -29,6 +34,7 @@ class PasswordUnlock:
         self.config_file = "user_config.json"
         self.password_fragments = ["", "", ""]
         self.master_password_hash = None
+        self.master_password_salt = None
         self.user_config = None
         
         # Load user configuration
@@ -58,6 +64,7 @@ class PasswordUnlock:
             with open(self.config_file, 'r') as f:
                 self.user_config = json.load(f)
             self.master_password_hash = self.user_config.get('master_password_hash')
+            self.master_password_salt = self.user_config.get('master_password_salt')
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load user configuration:\n\n{str(e)}")
             self.root.destroy()
@@ -163,6 +170,14 @@ Contact each person and ask them for their password fragment, then enter all 3 b
                                        foreground="orange")
             self.unlock_button.config(state="disabled")
             
+    def _verify_master_password(self, master_password: str) -> bool:
+        """Check the password against the stored salted hash"""
+        if not self.master_password_salt or not isinstance(self.master_password_hash, str):
+            # Configs written before salted hashing stored hash(), which changes every run
+            return False
+        return hmac.compare_digest(hash_master_password(master_password, self.master_password_salt),
+                                   self.master_password_hash)
+            
     def attempt_unlock(self):
         """Attempt to unlock using the provided fragments"""
         fragments = [var.get().strip().upper() for var in self.fragment_vars]
@@ -171,7 +186,7 @@ Contact each person and ask them for their password fragment, then enter all 3 b
         master_password = ''.join(fragments)
         
         # Verify against stored hash
-        if hash(master_password) == self.master_password_hash:
+        if self._verify_master_password(master_password):
             # Success!
             self.unlock_successful = True
             
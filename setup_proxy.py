@@ -18,7 +18,6 @@ def install_dependencies():
         "sentence-transformers>=2.2.2", 
         "torch>=2.0.0",
         "numpy>=1.24.0",
-        "scikit-learn>=1.3.0",
         "transformers>=4.30.0"
     ]
     